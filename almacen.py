@@ -0,0 +1,192 @@
+# ============================================
+# CHASIDE · ALMACÉN PERSISTENTE DE RESULTADOS (OPCIONAL)
+# Estado del análisis (df puntuado, cubo, respuestas empaquetadas y metadatos) en un directorio compartido,
+# con clave por huella de los datos, de la configuración y del código del análisis.
+# Sobrevive reinicios y lo comparten las réplicas del servidor: la primera lo
+# calcula y las demás lo leen de disco. Se conservan las ENTRADAS_POR_FUENTE
+# usadas más recientemente de cada fuente. Desactivado si CHASIDE_ALMACEN_DIR no
+# está definido.
+# ============================================
+
+import os
+import json
+import uuid
+import hashlib
+import contextlib
+
+import numpy as np
+import pandas as pd
+
+import chaside
+from chaside import nulos_como_nan
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin bloqueo entre procesos; la escritura sigue siendo atómica
+    fcntl = None
+
+DIRECTORIO_ALMACEN = os.environ.get("CHASIDE_ALMACEN_DIR")
+ENTRADAS_POR_FUENTE = int(os.environ.get("CHASIDE_ALMACEN_ENTRADAS", "3"))
+# Cambia si cambia la forma del estado guardado; las entradas anteriores se ignoran
+VERSION_ALMACEN = 3
+
+def huella_codigo() -> str:
+    """SHA-1 de chaside.py: un despliegue que cambia la lógica del análisis no reutiliza resultados."""
+    with open(chaside.__file__, "rb") as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+HUELLA_CODIGO = huella_codigo()
+
+def clave_almacen(huella_datos: str, huella_config: str) -> str:
+    return hashlib.sha1(
+        f"{VERSION_ALMACEN}:{HUELLA_CODIGO}:{huella_datos}:{huella_config}".encode("utf-8")
+    ).hexdigest()
+
+def rutas_almacen(directorio: str, clave: str) -> dict:
+    base = os.path.join(directorio, clave)
+    return {
+        'meta': base + ".json",
+        'df': base + ".df.parquet",
+        'cubo': base + ".cubo.parquet",
+        'respuestas': base + ".respuestas.npy",
+        'bloqueo': base + ".lock"
+    }
+
+@contextlib.contextmanager
+def bloqueo(ruta: str, exclusivo: bool):
+    """flock compartido (lectores) o exclusivo (un solo escritor) sobre `ruta`."""
+    with open(ruta, "a+") as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX if exclusivo else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+def _leer(rutas: dict):
+    if not os.path.exists(rutas['meta']):
+        return None
+    with open(rutas['meta'], encoding="utf-8") as f:
+        meta = json.load(f)
+    return {
+        'df': nulos_como_nan(pd.read_parquet(rutas['df'])),
+        'cubo': nulos_como_nan(pd.read_parquet(rutas['cubo'])),
+        'respuestas': np.load(rutas['respuestas']),
+        'respuestas_no_reconocidas': meta['respuestas_no_reconocidas'],
+        'umbral_intrapersonal': float(meta['umbral_intrapersonal']),
+        'columnas': meta['columnas'],
+        'filas_procesadas': meta['filas_procesadas'],
+        'huella_ultima_fila': meta['huella_ultima_fila']
+    }
+
+def _escribir(rutas: dict, estado: dict, fuente: str) -> None:
+    """Datos primero y metadatos al final (cada uno vía temporal + os.replace): sin .json no hay entrada."""
+    sufijo = f".{uuid.uuid4().hex}.tmp"
+    try:
+        for nombre in ('df', 'cubo'):
+            estado[nombre].to_parquet(rutas[nombre] + sufijo, index=True)
+            os.replace(rutas[nombre] + sufijo, rutas[nombre])
+        with open(rutas['respuestas'] + sufijo, "wb") as f:
+            np.save(f, estado['respuestas'])
+        os.replace(rutas['respuestas'] + sufijo, rutas['respuestas'])
+        meta = {
+            'fuente': fuente,
+            'respuestas_no_reconocidas': estado['respuestas_no_reconocidas'],
+            'umbral_intrapersonal': float(estado['umbral_intrapersonal']),
+            'columnas': estado['columnas'],
+            'filas_procesadas': estado['filas_procesadas'],
+            'huella_ultima_fila': estado['huella_ultima_fila']
+        }
+        with open(rutas['meta'] + sufijo, "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(rutas['meta'] + sufijo, rutas['meta'])
+    finally:
+        for nombre in ('df', 'cubo', 'respuestas', 'meta'):
+            if os.path.exists(rutas[nombre] + sufijo):
+                os.remove(rutas[nombre] + sufijo)
+
+def leer_estado(clave: str, directorio: str = None):
+    """Estado guardado con `clave`, o None si no existe o no puede leerse."""
+    directorio = directorio or DIRECTORIO_ALMACEN
+    if not directorio:
+        return None
+    rutas = rutas_almacen(directorio, clave)
+    try:
+        os.makedirs(directorio, exist_ok=True)
+        with bloqueo(rutas['bloqueo'], exclusivo=False):
+            estado = _leer(rutas)
+            if estado is not None:
+                os.utime(rutas['meta'])   # usada ahora: la limpieza la conserva
+            return estado
+    except Exception:
+        return None
+
+def limpiar_fuente(directorio: str, fuente: str, conservar: int = ENTRADAS_POR_FUENTE, salvo: str = None) -> None:
+    """
+    Borra las entradas de `fuente` salvo las `conservar` usadas más recientemente
+    (y `salvo`). Cada una se borra con su bloqueo exclusivo: espera a sus lectores.
+    """
+    entradas = []
+    for nombre in os.listdir(directorio):
+        if not nombre.endswith(".json") or nombre[:-5] == salvo:
+            continue
+        ruta = os.path.join(directorio, nombre)
+        try:
+            with open(ruta, encoding="utf-8") as f:
+                if json.load(f).get('fuente') == fuente:
+                    entradas.append((os.path.getmtime(ruta), nombre[:-5]))
+        except (OSError, ValueError):
+            continue
+    conservar -= salvo is not None
+    for _, clave in sorted(entradas, reverse=True)[max(conservar, 0):]:
+        rutas = rutas_almacen(directorio, clave)
+        with bloqueo(rutas['bloqueo'], exclusivo=True):
+            # Metadatos primero: sin .json la entrada deja de existir para los lectores
+            for nombre in ('meta', 'df', 'cubo', 'respuestas'):
+                with contextlib.suppress(FileNotFoundError):
+                    os.remove(rutas[nombre])
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(rutas['bloqueo'])
+
+def estado_persistente(huella_datos: str, huella_config: str, calcular, directorio: str = None, fuente: str = ""):
+    """
+    Estado guardado para (datos, configuración) o, si no existe, `calcular()`
+    guardado para las demás réplicas. Devuelve (estado, origen) con origen
+    'almacén' o 'calculado'. El cálculo ocurre con el bloqueo exclusivo tomado:
+    una réplica que llega mientras otra calcula espera y lee su resultado.
+    Tras guardar, se borran las entradas antiguas de `fuente` (URL o rutas de la
+    hoja). Si el almacén no puede usarse (directorio, permisos, Parquet), sólo se calcula.
+    """
+    directorio = directorio or DIRECTORIO_ALMACEN
+    if not directorio:
+        return calcular(), 'calculado'
+    clave = clave_almacen(huella_datos, huella_config)
+    estado = leer_estado(clave, directorio)
+    if estado is not None:
+        return estado, 'almacén'
+
+    rutas = rutas_almacen(directorio, clave)
+    try:
+        os.makedirs(directorio, exist_ok=True)
+        open(rutas['bloqueo'], "a+").close()
+    except OSError:
+        return calcular(), 'calculado'
+    with bloqueo(rutas['bloqueo'], exclusivo=True):
+        try:
+            estado = _leer(rutas)
+        except Exception:
+            estado = None
+        if estado is not None:
+            return estado, 'almacén'
+        estado = calcular()
+        try:
+            _escribir(rutas, estado, fuente)
+        except Exception:
+            return estado, 'calculado'
+    # Fuera del bloqueo propio: limpiar toma el de cada entrada que borra
+    try:
+        limpiar_fuente(directorio, fuente, salvo=clave)
+    except OSError:
+        pass
+    return estado, 'calculado'
@@ -0,0 +1,290 @@
+# ============================================
+# CHASIDE · BENCHMARK POR ETAPAS
+# Genera cohortes sintéticas deterministas con la forma del formulario y mide
+# tiempo y memoria pico de cada etapa del análisis. Uso:
+#   python benchmark.py --filas 1000 100000 1000000 --salida bench.json
+#   python benchmark.py --filas 1000 --comparar bench_anterior.json
+# ============================================
+
+import gc
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import datetime
+import subprocess
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from chaside import (
+    columna_carrera, columna_nombre, areas, intereses_items, aptitudes_items,
+    perfil_carreras, normalizar_respuestas, puntajes_area,
+    puntuar_respuestas, calcular_umbral_intrapersonal, clasificar_respuestas,
+    calcular_intensidad, calcular_destino_compatible, compactar_tipos, tabla_enriquecida,
+    conclusiones_cohorte, tareas_reportes, OPCIONES_CSV, EMPAQUETAR_RESPUESTAS,
+    empaquetar_respuestas
+)
+
+# ============================================
+# 1) COHORTE SINTÉTICA
+# ============================================
+SEMILLA = 2024
+# Cambia si cambia el generador: los CSV ya generados con otra versión no se reutilizan
+VERSION_GENERADOR = 2
+N_ITEMS = 98
+
+# Variantes de escritura observadas en las exportaciones del formulario
+variantes_si = np.array(['Sí', 'Si', 'si', 'SI', 'sí', ' Sí'], dtype=object)
+prob_variantes_si = [0.80, 0.08, 0.05, 0.03, 0.02, 0.02]
+variantes_no = np.array(['No', 'no', 'NO', ' No', 'no '], dtype=object)
+prob_variantes_no = [0.85, 0.07, 0.04, 0.02, 0.02]
+prob_vacio = 0.005
+prob_no_reconocida = 0.001
+# Texto que la normalización no reconoce (y reporta); 'N/A' llega como texto gracias a OPCIONES_CSV
+tokens_no_reconocidos = np.array(['N/A', '?', 'tal vez', 'Sí/No'], dtype=object)
+prob_siempre_igual = 0.015
+prob_perfil_coherente = 0.6
+
+carreras_sinteticas = list(perfil_carreras) + ['Otra carrera']
+nombres = ['Ana', 'Luis', 'María', 'José', 'Fernanda', 'Carlos', 'Sofía', 'Diego',
+           'Valeria', 'Jorge', 'Daniela', 'Miguel', 'Andrea', 'Ricardo', 'Paola', 'Héctor']
+apellidos = ['García', 'Hernández', 'López', 'Martínez', 'González', 'Pérez', 'Rodríguez',
+             'Sánchez', 'Ramírez', 'Cruz', 'Flores', 'Gómez', 'Morales', 'Vázquez', 'Reyes']
+
+def areas_por_item(n_items: int = N_ITEMS) -> np.ndarray:
+    """Índice del área de cada ítem (intereses y aptitudes)."""
+    area_item = np.zeros(n_items, dtype=np.intp)
+    for j, a in enumerate(areas):
+        for item in intereses_items[a] + aptitudes_items[a]:
+            area_item[item - 1] = j
+    return area_item
+
+def generar_bloque(rng: np.random.Generator, inicio: int, filas: int) -> pd.DataFrame:
+    """Filas `inicio`..`inicio + filas` de la cohorte sintética."""
+    carrera_idx = rng.integers(len(carreras_sinteticas), size=filas)
+
+    # Áreas fuertes latentes: las del perfil de la carrera o dos al azar
+    fuertes = np.zeros((filas, len(areas)), dtype=bool)
+    fuertes[np.arange(filas)[:, None], rng.integers(len(areas), size=(filas, 2))] = True
+    coherente = rng.random(filas) < prob_perfil_coherente
+    for k, carrera in enumerate(carreras_sinteticas):
+        letras = perfil_carreras.get(carrera, {}).get('Fuerte', [])
+        filas_k = coherente & (carrera_idx == k)
+        if letras and filas_k.any():
+            fuertes[filas_k] = np.isin(areas, letras)
+
+    prob = np.where(fuertes[:, areas_por_item()], 0.65, 0.30)
+    prob = np.clip(prob + rng.normal(0, 0.08, size=(filas, 1)), 0.02, 0.98)
+    respuestas = rng.random((filas, N_ITEMS)) < prob
+    siempre_igual = rng.random(filas) < prob_siempre_igual
+    respuestas[siempre_igual] = (rng.random(int(siempre_igual.sum())) < 0.5)[:, None]
+
+    items = np.where(
+        respuestas,
+        variantes_si[rng.choice(len(variantes_si), size=respuestas.shape, p=prob_variantes_si)],
+        variantes_no[rng.choice(len(variantes_no), size=respuestas.shape, p=prob_variantes_no)]
+    )
+    ruido = rng.random(respuestas.shape)
+    items[ruido < prob_vacio] = ''
+    no_reconocida = ruido > 1 - prob_no_reconocida
+    items[no_reconocida] = tokens_no_reconocidos[rng.integers(len(tokens_no_reconocidos), size=int(no_reconocida.sum()))]
+
+    folio = np.arange(inicio, inicio + filas)
+    datos = {
+        'Marca temporal': pd.Timestamp('2025-01-06') + pd.to_timedelta(folio * 37, unit='s'),
+        'Dirección de correo electrónico': [f'alumno{i}@correo.mx' for i in folio],
+        columna_nombre: [
+            f'{n} {a1} {a2}' for n, a1, a2 in zip(
+                np.array(nombres)[rng.integers(len(nombres), size=filas)],
+                np.array(apellidos)[rng.integers(len(apellidos), size=filas)],
+                np.array(apellidos)[rng.integers(len(apellidos), size=filas)]
+            )
+        ],
+        columna_carrera: np.array(carreras_sinteticas, dtype=object)[carrera_idx],
+        'Semestre': 1,
+    }
+    bloque = pd.DataFrame(datos)
+    # Una sola concatenación: asignar 98 columnas una por una fragmenta el DataFrame
+    return pd.concat(
+        [bloque, pd.DataFrame(items, columns=[f'P{j + 1}' for j in range(N_ITEMS)])],
+        axis=1
+    )
+
+def generar_cohorte(filas: int, ruta: str, semilla: int = SEMILLA, bloque: int = 100_000) -> str:
+    """Escribe un CSV con `filas` respuestas sintéticas; misma semilla y bloque → mismo archivo."""
+    rng = np.random.default_rng(semilla)
+    temporal = ruta + ".tmp"
+    for inicio in range(0, filas, bloque):
+        generar_bloque(rng, inicio, min(bloque, filas - inicio)).to_csv(
+            temporal, mode='w' if inicio == 0 else 'a', header=inicio == 0, index=False
+        )
+    os.replace(temporal, ruta)
+    return ruta
+
+# ============================================
+# 2) MEDICIÓN POR ETAPAS
+# ============================================
+def medir(resultados: dict, etapa: str, fn, memoria: bool = True, **extra):
+    """Ejecuta `fn()` y guarda segundos y memoria pico (MB, vía tracemalloc) de la etapa."""
+    gc.collect()
+    if memoria:
+        tracemalloc.start()
+    inicio = time.perf_counter()
+    valor = fn()
+    segundos = time.perf_counter() - inicio
+    pico = None
+    if memoria:
+        pico = tracemalloc.get_traced_memory()[1] / 2**20
+        tracemalloc.stop()
+    resultados[etapa] = dict(segundos=round(segundos, 6),
+                             pico_mb=round(pico, 3) if pico is not None else None, **extra)
+    return valor
+
+def renderizar_muestra(df: pd.DataFrame, muestra: int) -> int:
+    from reporte_pdf import build_pdf_report
+
+    hechos = 0
+    for _, campos in tareas_reportes(df.head(muestra)):
+        build_pdf_report(**campos)
+        hechos += 1
+    return hechos
+
+def medir_cohorte(ruta: str, pdf_muestra: int = 200, memoria: bool = True) -> dict:
+    """Corre todas las etapas sobre el CSV `ruta` y devuelve {etapa: mediciones}."""
+    etapas = {}
+    df_raw = medir(etapas, 'lectura_csv', lambda: pd.read_csv(ruta, **OPCIONES_CSV), memoria)
+    columnas_items = df_raw.columns[5:103]
+
+    matriz, no_reconocidas = medir(etapas, 'normalizacion',
+                                   lambda: normalizar_respuestas(df_raw[columnas_items]), memoria)
+    etapas['normalizacion']['respuestas_no_reconocidas'] = int(sum(no_reconocidas.values()))
+    medir(etapas, 'puntaje_areas', lambda: puntajes_area(
+        matriz, empaquetar_respuestas(matriz) if EMPAQUETAR_RESPUESTAS else None), memoria)
+    del matriz
+
+    # Armado del DataFrame puntuado (no es una etapa medida: repite normalización y puntaje)
+    df, _, _, _ = puntuar_respuestas(df_raw)
+    if EMPAQUETAR_RESPUESTAS:   # como el estado del análisis: los ítems quedan empaquetados
+        df = df.drop(columns=columnas_items)
+    del df_raw
+
+    def etapa_semaforo():
+        clasificar_respuestas(df, calcular_umbral_intrapersonal(df['Desv_Intrapersona']))
+
+    medir(etapas, 'semaforo', etapa_semaforo, memoria)
+    destino = medir(etapas, 'destino_compatible', lambda: calcular_destino_compatible(df), memoria)
+    df['Destino_Compatible'] = destino
+    df['Nivel_Intensidad'] = medir(etapas, 'intensidad', lambda: calcular_intensidad(df), memoria)
+
+    bytes_antes = int(df.memory_usage(deep=True).sum())
+    medir(etapas, 'tipos_compactos', lambda: compactar_tipos(df), memoria)
+    bytes_despues = int(df.memory_usage(deep=True).sum())
+    etapas['tipos_compactos'].update(
+        bytes_por_estudiante_antes=round(bytes_antes / max(len(df), 1), 1),
+        bytes_por_estudiante=round(bytes_despues / max(len(df), 1), 1)
+    )
+
+    enriquecida = tabla_enriquecida(df, con_conclusion=False)
+    medir(etapas, 'conclusion', lambda: conclusiones_cohorte(enriquecida), memoria)
+    del enriquecida
+
+    if pdf_muestra:
+        # Importar ReportLab y armar la hoja de estilos queda fuera de la medición
+        from reporte_pdf import estilos_proceso
+        estilos_proceso()
+        reportes = min(pdf_muestra, len(df))
+        medir(etapas, 'pdf', lambda: renderizar_muestra(df, reportes), memoria,
+              reportes=reportes)
+        pdf = etapas['pdf']
+        pdf['reportes_por_segundo'] = round(reportes / pdf['segundos'], 3) if pdf['segundos'] else None
+        pdf['segundos_estimados_cohorte'] = (
+            round(pdf['segundos'] / reportes * len(df), 3) if reportes else 0.0
+        )
+    return etapas
+
+# ============================================
+# 3) RESULTADOS
+# ============================================
+def describir_entorno() -> dict:
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)), timeout=10
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        'fecha': datetime.datetime.now().isoformat(timespec='seconds'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'plataforma': platform.platform(),
+        'cpus': os.cpu_count(),
+    }
+
+def imprimir_corrida(filas: int, etapas: dict, anterior: dict = None) -> None:
+    print(f"\n{filas:,} filas")
+    for etapa, m in etapas.items():
+        pico = f"{m['pico_mb']:10.1f} MB" if m['pico_mb'] is not None else " " * 13
+        linea = f"  {etapa:<20}{m['segundos']:10.3f} s{pico}"
+        if anterior and etapa in anterior and anterior[etapa]['segundos']:
+            linea += f"   ×{m['segundos'] / anterior[etapa]['segundos']:.2f} vs. anterior"
+        print(linea)
+    if 'tipos_compactos' in etapas:
+        m = etapas['tipos_compactos']
+        print(f"  df en memoria: {m['bytes_por_estudiante_antes']:,.0f} → {m['bytes_por_estudiante']:,.0f} bytes por estudiante")
+    if 'respuestas_no_reconocidas' in etapas.get('normalizacion', {}):
+        print(f"  respuestas no reconocidas: {etapas['normalizacion']['respuestas_no_reconocidas']:,}")
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Mide tiempo y memoria pico de cada etapa del análisis CHASIDE sobre cohortes sintéticas."
+    )
+    parser.add_argument("--filas", type=int, nargs="+", default=[1_000, 100_000, 1_000_000],
+                        help="Tamaños de cohorte (default: 1000 100000 1000000)")
+    parser.add_argument("--semilla", type=int, default=SEMILLA, help=f"Semilla del generador (default: {SEMILLA})")
+    parser.add_argument("--datos", default=".bench_data",
+                        help="Directorio de los CSV sintéticos; se reutilizan si ya existen (default: .bench_data)")
+    parser.add_argument("--pdf-muestra", type=int, default=200,
+                        help="Reportes PDF a renderizar por cohorte; 0 omite la etapa (default: 200)")
+    parser.add_argument("--sin-memoria", action="store_true",
+                        help="No medir memoria pico (tracemalloc agrega sobrecosto a los tiempos)")
+    parser.add_argument("--salida", default="bench_resultados.json", help="Archivo JSON de resultados")
+    parser.add_argument("--comparar", help="JSON de una corrida anterior para mostrar la razón de tiempos")
+    args = parser.parse_args(argv)
+
+    anteriores = {}
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as f:
+            anteriores = {c['filas']: c['etapas'] for c in json.load(f)['corridas']}
+
+    os.makedirs(args.datos, exist_ok=True)
+    resultado = {
+        'entorno': describir_entorno(),
+        'parametros': {'semilla': args.semilla, 'pdf_muestra': args.pdf_muestra,
+                       'memoria': not args.sin_memoria},
+        'corridas': [],
+    }
+    for filas in args.filas:
+        ruta = os.path.join(args.datos, f"cohorte_{filas}_{args.semilla}_v{VERSION_GENERADOR}.csv")
+        if not os.path.exists(ruta):
+            inicio = time.perf_counter()
+            generar_cohorte(filas, ruta, semilla=args.semilla)
+            print(f"Generado {ruta} en {time.perf_counter() - inicio:.1f} s", file=sys.stderr)
+        etapas = medir_cohorte(ruta, pdf_muestra=args.pdf_muestra, memoria=not args.sin_memoria)
+        resultado['corridas'].append({'filas': filas, 'archivo': ruta, 'etapas': etapas})
+        imprimir_corrida(filas, etapas, anteriores.get(filas))
+
+        # Se reescribe tras cada cohorte para no perder resultados si una corrida grande falla
+        with open(args.salida, "w", encoding="utf-8") as f:
+            json.dump(resultado, f, ensure_ascii=False, indent=2)
+    print(f"\nResultados → {args.salida}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,1671 @@
+# ============================================
+# CHASIDE · BIBLIOTECA DE ANÁLISIS
+# Carga, normalización, puntaje CHASIDE, semáforo, intensidad, destino compatible
+# y conclusión, sin dependencia de Streamlit. Uso por lotes:
+#   python chaside.py respuestas.csv resultados.parquet --procesos 4
+# ============================================
+
+import io
+import os
+import re
+import sys
+import json
+import uuid
+import hashlib
+import argparse
+import itertools
+import threading
+import unicodedata
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import numpy as np
+import requests
+from requests.adapters import HTTPAdapter
+
+from perfilado import etapa
+
+# ============================================
+# 1) CARGA DE DATOS
+# ============================================
+# Snapshot local de cada exportación: Parquet + metadatos de validación (ETag,
+# Last-Modified, mtime/tamaño para archivos locales y hash del contenido).
+DIRECTORIO_SNAPSHOTS = os.environ.get("CHASIDE_SNAPSHOT_DIR", ".chaside_cache")
+# Cambia si cambia la forma de leer el CSV; los snapshots anteriores se ignoran
+VERSION_SNAPSHOT = 2
+
+# Sólo la celda vacía es nula: 'N/A', 'NA', 'null', '#N/A'... llegan como texto a
+# normalizar_respuestas y se reportan como no reconocidas en lugar de volverse 0
+OPCIONES_CSV = {'keep_default_na': False, 'na_values': ['']}
+
+def ruta_local(u: str):
+    """Ruta en disco si la fuente es `file://` o una ruta local; None si es remota."""
+    partes = urllib.parse.urlparse(u)
+    if partes.scheme == "file":
+        return urllib.request.url2pathname(partes.path)
+    if len(partes.scheme) > 1:   # una sola letra es la unidad de una ruta de Windows
+        return None
+    return u
+
+def huella_dataframe(df: pd.DataFrame) -> str:
+    """SHA-1 de columnas y valores, para fuentes cuyo contenido CSV no se obtiene como bytes."""
+    h = hashlib.sha1("\x1f".join(map(str, df.columns)).encode("utf-8"))
+    h.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return h.hexdigest()
+
+# Sesión HTTP compartida: reutiliza conexiones (keep-alive) entre descargas y hilos
+HILOS_DESCARGA = 8
+_sesion_http = None
+_lock_sesion_http = threading.Lock()
+
+def sesion_http() -> requests.Session:
+    global _sesion_http
+    with _lock_sesion_http:
+        if _sesion_http is None:
+            sesion = requests.Session()
+            adaptador = HTTPAdapter(pool_connections=HILOS_DESCARGA, pool_maxsize=HILOS_DESCARGA)
+            sesion.mount("http://", adaptador)
+            sesion.mount("https://", adaptador)
+            _sesion_http = sesion
+        return _sesion_http
+
+def rutas_snapshot(u: str):
+    base = os.path.join(DIRECTORIO_SNAPSHOTS, hashlib.sha1(u.encode("utf-8")).hexdigest())
+    return base + ".json", base + ".parquet"
+
+def leer_metadatos_snapshot(u: str):
+    ruta_meta, ruta_datos = rutas_snapshot(u)
+    if not (os.path.exists(ruta_meta) and os.path.exists(ruta_datos)):
+        return None
+    try:
+        with open(ruta_meta, encoding="utf-8") as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return meta if meta.get("version") == VERSION_SNAPSHOT else None
+
+def nulos_como_nan(df: pd.DataFrame) -> pd.DataFrame:
+    """Parquet devuelve None en columnas de texto; el análisis (y el CSV) trabajan con NaN."""
+    for c in df.columns[df.dtypes == object]:
+        if df[c].isna().any():
+            df[c] = df[c].where(df[c].notna(), np.nan)
+    return df
+
+def leer_snapshot(ruta_datos: str) -> pd.DataFrame:
+    return nulos_como_nan(pd.read_parquet(ruta_datos))
+
+def guardar_snapshot(u: str, df: pd.DataFrame, meta: dict, escribir_datos: bool = True) -> None:
+    """
+    Escritura atómica (temporal con nombre único + os.replace), segura entre réplicas
+    que comparten el directorio; si falla, se sigue sin snapshot.
+    """
+    ruta_meta, ruta_datos = rutas_snapshot(u)
+    sufijo = f".{uuid.uuid4().hex}.tmp"
+    try:
+        os.makedirs(DIRECTORIO_SNAPSHOTS, exist_ok=True)
+        if escribir_datos:
+            df.to_parquet(ruta_datos + sufijo, index=True)
+            os.replace(ruta_datos + sufijo, ruta_datos)
+        with open(ruta_meta + sufijo, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(ruta_meta + sufijo, ruta_meta)
+    except Exception:
+        pass
+    finally:
+        for ruta in (ruta_datos, ruta_meta):
+            if os.path.exists(ruta + sufijo):
+                os.remove(ruta + sufijo)
+
+def leer_fuente(u: str):
+    """
+    Lee la exportación CSV usando el snapshot local cuando la fuente no cambió.
+    Devuelve (df, huella) donde la huella es el SHA-1 del contenido CSV. Las URL que
+    no son http(s) (ftp://, s3://…) las lee pandas sin snapshot: no hay validadores
+    con qué revalidarlas, y la huella es la del DataFrame leído.
+    """
+    local = ruta_local(u)
+    if local is None and urllib.parse.urlparse(u).scheme not in ("http", "https"):
+        df = pd.read_csv(u, **OPCIONES_CSV)
+        return df, huella_dataframe(df)
+
+    meta = leer_metadatos_snapshot(u)
+    _, ruta_datos = rutas_snapshot(u)
+
+    if local is not None:
+        info = os.stat(local)
+        validadores = {"mtime_ns": info.st_mtime_ns, "size": info.st_size}
+        if meta and all(meta.get(k) == v for k, v in validadores.items()):
+            return leer_snapshot(ruta_datos), meta["sha1"]
+        with open(local, "rb") as f:
+            contenido = f.read()
+    else:
+        encabezados = {}
+        if meta and meta.get("etag"):
+            encabezados["If-None-Match"] = meta["etag"]
+        if meta and meta.get("last_modified"):
+            encabezados["If-Modified-Since"] = meta["last_modified"]
+        resp = sesion_http().get(u, headers=encabezados, timeout=60)
+        if resp.status_code == 304 and meta:
+            return leer_snapshot(ruta_datos), meta["sha1"]
+        resp.raise_for_status()
+        contenido = resp.content
+        validadores = {
+            "etag": resp.headers.get("ETag"),
+            "last_modified": resp.headers.get("Last-Modified")
+        }
+
+    huella = hashlib.sha1(contenido).hexdigest()
+    if meta and meta.get("sha1") == huella:
+        guardar_snapshot(u, None, {**meta, **validadores}, escribir_datos=False)
+        return leer_snapshot(ruta_datos), huella
+
+    df = pd.read_csv(io.BytesIO(contenido), **OPCIONES_CSV)
+    guardar_snapshot(u, df, {"version": VERSION_SNAPSHOT, "fuente": u, "sha1": huella, **validadores})
+    return df, huella
+
+# Varias fuentes (un formulario por plantel / periodo) analizadas como una cohorte
+columna_fuente = 'Fuente'
+
+def interpretar_fuentes(texto: str) -> list:
+    """
+    Una fuente por línea, opcionalmente «etiqueta | URL o ruta». Sin etiqueta se usa
+    el nombre del archivo (rutas locales) o «Fuente k». Devuelve [(etiqueta, fuente)].
+    """
+    fuentes, vistas = [], set()
+    for linea in texto.splitlines():
+        linea = linea.strip()
+        if not linea:
+            continue
+        etiqueta, _, fuente = linea.rpartition("|")
+        etiqueta, fuente = etiqueta.strip(), fuente.strip()
+        if not etiqueta:
+            local = ruta_local(fuente)
+            etiqueta = (
+                os.path.splitext(os.path.basename(local))[0] if local
+                else f"Fuente {len(fuentes) + 1}"
+            )
+        base, k = etiqueta, 2
+        while etiqueta in vistas:
+            etiqueta, k = f"{base} ({k})", k + 1
+        vistas.add(etiqueta)
+        fuentes.append((etiqueta, fuente))
+    return fuentes
+
+def leer_fuentes(fuentes: list, cargar=None, hilos: int = HILOS_DESCARGA):
+    """
+    Lee las fuentes [(etiqueta, URL o ruta)] en paralelo con `cargar` (leer_fuente
+    por omisión). Una fuente que falla, repite otra o no tiene la estructura del
+    formulario se reporta y se omite; las demás siguen.
+    Devuelve ([(etiqueta, df, huella)] en el orden dado, {etiqueta: error}).
+    """
+    cargar = cargar or leer_fuente
+    errores, pendientes, urls = {}, [], set()
+    for etiqueta, u in fuentes:
+        if u in urls:
+            errores[etiqueta] = "fuente repetida"
+        else:
+            urls.add(u)
+            pendientes.append((etiqueta, u))
+
+    with ThreadPoolExecutor(max(1, min(hilos, len(pendientes)))) as pool:
+        futuros = [(etiqueta, pool.submit(cargar, u)) for etiqueta, u in pendientes]
+
+    cargadas, referencia = [], None
+    for etiqueta, futuro in futuros:
+        try:
+            df, huella = futuro.result()
+        except Exception as e:
+            errores[etiqueta] = str(e) or type(e).__name__
+            continue
+        faltantes = columnas_faltantes(df)
+        if faltantes:
+            errores[etiqueta] = f"faltan columnas requeridas: {faltantes}"
+            continue
+        # Los ítems se leen por posición: nombre y carrera deben estar en el mismo lugar
+        estructura = (len(df.columns) >= 103, df.columns.get_loc(columna_carrera), df.columns.get_loc(columna_nombre))
+        if referencia is None:
+            referencia = estructura
+        if not estructura[0] or estructura != referencia:
+            errores[etiqueta] = "las columnas no coinciden con la estructura del formulario"
+            continue
+        cargadas.append((etiqueta, df, huella))
+    return cargadas, errores
+
+def combinar_fuentes(cargadas: list):
+    """
+    Une las fuentes leídas en un solo DataFrame con la columna `Fuente` al final
+    (los ítems siguen en las posiciones 5..102). Las columnas de los ítems toman
+    los encabezados de la primera fuente. Devuelve (df, huella combinada).
+    """
+    columnas = cargadas[0][1].columns[:103]
+    partes = []
+    for etiqueta, df, _ in cargadas:
+        df = df.set_axis(list(columnas) + list(df.columns[103:]), axis=1)
+        partes.append(df.assign(**{columna_fuente: etiqueta}))
+    df = pd.concat(partes, ignore_index=True)
+    df[columna_fuente] = df.pop(columna_fuente)
+    huella = hashlib.sha1(
+        "\n".join(f"{etiqueta}:{huella}" for etiqueta, _, huella in cargadas).encode("utf-8")
+    ).hexdigest()
+    return df, huella
+
+# ============================================
+# 2) PREPROCESAMIENTO CHASIDE
+# ============================================
+columna_carrera = '¿A qué carrera desea ingresar?'
+columna_nombre  = 'Ingrese su nombre completo'
+
+def columnas_faltantes(df: pd.DataFrame) -> list:
+    return [c for c in [columna_carrera, columna_nombre] if c not in df.columns]
+
+# Sí/No → 1/0
+respuestas_validas = {
+    'sí': 1, 'si': 1, 's': 1, '1': 1, 'true': 1, 'verdadero': 1, 'x': 1,
+    'no': 0, 'n': 0, '0': 0, 'false': 0, 'falso': 0, '': 0, 'nan': 0
+}
+
+def codificar_respuesta(valor):
+    """Devuelve (código 0/1, reconocido) para un valor crudo de la hoja."""
+    if pd.isna(valor):
+        return 0, True
+    texto = str(valor).strip().lower()
+    if texto in respuestas_validas:
+        return respuestas_validas[texto], True
+    try:
+        numero = float(texto)
+    except ValueError:
+        return 0, False
+    if numero in (0.0, 1.0):
+        return int(numero), True
+    return 0, False
+
+def normalizar_respuestas(bloque: pd.DataFrame):
+    """
+    Convierte el bloque de ítems en una matriz uint8 N×98 contigua.
+    Cada valor distinto se normaliza una sola vez; las respuestas no
+    reconocidas se cuentan como 0 y se devuelven con su frecuencia.
+    """
+    valores = bloque.to_numpy(dtype=object)
+    codigos, unicos = pd.factorize(valores.ravel(), use_na_sentinel=False)
+
+    tabla = np.zeros(len(unicos), dtype=np.uint8)
+    no_reconocidos = []
+    for k, valor in enumerate(unicos):
+        tabla[k], ok = codificar_respuesta(valor)
+        if not ok:
+            no_reconocidos.append(k)
+
+    frecuencias = np.bincount(codigos, minlength=len(unicos))
+    reporte = {str(unicos[k]): int(frecuencias[k]) for k in no_reconocidos}
+    matriz = np.ascontiguousarray(tabla[codigos].reshape(valores.shape))
+    return matriz, reporte
+
+# Respuestas empaquetadas: las 98 respuestas binarias de cada estudiante en dos
+# palabras de 64 bits, guardadas palabra por palabra (palabras × N) para recorrer
+# memoria contigua. El estado del análisis conserva esta matriz (16 bytes por
+# estudiante) para los estudiantes similares; con CHASIDE_EMPAQUETAR=1 también los
+# puntajes salen de ella (AND + popcount) y el df en memoria no guarda las 98
+# columnas de ítems.
+EMPAQUETAR_RESPUESTAS = os.environ.get("CHASIDE_EMPAQUETAR", "") == "1"
+BLOQUE_POPCOUNT = 1 << 16
+
+popcount_byte = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1).sum(axis=1).astype(np.uint8)
+
+def popcount64(palabras: np.ndarray) -> np.ndarray:
+    """Bits en 1 de cada elemento de un arreglo uint64 1-D (np.bitwise_count si existe; si no, por bytes)."""
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(palabras)
+    return popcount_byte[palabras.view(np.uint8).reshape(-1, 8)].sum(axis=1, dtype=np.uint8)
+
+def empaquetar_respuestas(matriz_items: np.ndarray) -> np.ndarray:
+    """Matriz 0/1 N×ítems → palabras uint64 × N (bits en orden de ítem, relleno en 0)."""
+    bytes_items = np.packbits(matriz_items, axis=1)
+    n_palabras = -(-matriz_items.shape[1] // 64)
+    palabras = np.zeros((len(matriz_items), n_palabras * 8), dtype=np.uint8)
+    palabras[:, :bytes_items.shape[1]] = bytes_items
+    return np.ascontiguousarray(palabras.view(np.uint64).T)
+
+def contar_unos_empaquetado(respuestas: np.ndarray, mascaras: np.ndarray) -> np.ndarray:
+    """AND + popcount de cada estudiante contra cada máscara (palabras × N, palabras × M → N × M)."""
+    n_palabras, n = respuestas.shape
+    conteos = np.zeros((n, mascaras.shape[1]), dtype=np.int64)
+    tramo = np.empty(min(n, BLOQUE_POPCOUNT), dtype=np.uint64)
+    for inicio in range(0, n, BLOQUE_POPCOUNT):
+        fin = min(inicio + BLOQUE_POPCOUNT, n)
+        for m in range(mascaras.shape[1]):
+            for j in range(n_palabras):
+                np.bitwise_and(respuestas[j, inicio:fin], mascaras[j, m], out=tramo[:fin - inicio])
+                conteos[inicio:fin, m] += popcount64(tramo[:fin - inicio])
+    return conteos
+
+def desviacion_intrapersona(matriz_items: np.ndarray) -> np.ndarray:
+    """
+    Desviación estándar muestral (ddof=1) de las respuestas 0/1 de cada estudiante,
+    por bloques de filas. Da los mismos valores que df[items].std(axis=1), redondeo
+    incluido: en float64 y en orden de columnas, como los valores de un DataFrame,
+    así cada fila se suma ítem por ítem. La forma cerrada sqrt(k(n-k)/(n(n-1)))
+    difiere en el último dígito y cambia quién queda bajo el umbral del cuantil 10%.
+    """
+    desviacion = np.empty(len(matriz_items))
+    for inicio in range(0, len(matriz_items), BLOQUE_POPCOUNT):
+        bloque = np.asfortranarray(matriz_items[inicio:inicio + BLOQUE_POPCOUNT], dtype=np.float64)
+        desviacion[inicio:inicio + BLOQUE_POPCOUNT] = bloque.std(axis=1, ddof=1)
+    return desviacion
+
+# Mapeo CHASIDE
+areas = ['C','H','A','S','I','D','E']
+
+intereses_items = {
+    'C':[1,12,20,53,64,71,78,85,91,98],
+    'H':[9,25,34,41,56,67,74,80,89,95],
+    'A':[3,11,21,28,36,45,50,57,81,96],
+    'S':[8,16,23,33,44,52,62,70,87,92],
+    'I':[6,19,27,38,47,54,60,75,83,97],
+    'D':[5,14,24,31,37,48,58,65,73,84],
+    'E':[17,32,35,42,49,61,68,77,88,93]
+}
+
+aptitudes_items = {
+    'C':[2,15,46,51],
+    'H':[30,63,72,86],
+    'A':[22,39,76,82],
+    'S':[4,29,40,69],
+    'I':[10,26,59,90],
+    'D':[13,18,43,66],
+    'E':[7,55,79,94]
+}
+
+peso_intereses, peso_aptitudes = 0.8, 0.2
+cuantil_intrapersonal = 0.10
+score_cols = [f'PUNTAJE_COMBINADO_{a}' for a in areas]
+
+# Matriz ítem → área (98 × 14): columnas 0..6 = intereses C..E, 7..13 = aptitudes C..E
+def construir_matriz_pesos(n_items: int = 98) -> np.ndarray:
+    W = np.zeros((n_items, 2 * len(areas)), dtype=np.int64)
+    for j, a in enumerate(areas):
+        W[[i - 1 for i in intereses_items[a]], j] = 1
+        W[[i - 1 for i in aptitudes_items[a]], len(areas) + j] = 1
+    return W
+
+# Perfiles de carrera
+perfil_carreras = {
+    'Arquitectura': {'Fuerte': ['A','I','C']},
+    'Contador Público': {'Fuerte': ['C','D']},
+    'Licenciatura en Administración': {'Fuerte': ['C','D']},
+    'Ingeniería Ambiental': {'Fuerte': ['I','C','E']},
+    'Ingeniería Bioquímica': {'Fuerte': ['I','C','E']},
+    'Ingeniería en Gestión Empresarial': {'Fuerte': ['C','D','H']},
+    'Ingeniería Industrial': {'Fuerte': ['C','D','H']},
+    'Ingeniería en Inteligencia Artificial': {'Fuerte': ['I','E']},
+    'Ingeniería Mecatrónica': {'Fuerte': ['I','E']},
+    'Ingeniería en Sistemas Computacionales': {'Fuerte': ['I','E']}
+}
+
+def huella_configuracion() -> str:
+    """Hash de todo lo que define el puntaje; cambia si cambian respuestas aceptadas, ítems, pesos o perfiles."""
+    config = (
+        respuestas_validas, areas, intereses_items, aptitudes_items,
+        peso_intereses, peso_aptitudes, cuantil_intrapersonal,
+        corte_sin_perfil, corte_joven_promesa,
+        perfil_carreras, EMPAQUETAR_RESPUESTAS
+    )
+    return hashlib.sha1(repr(config).encode("utf-8")).hexdigest()
+
+def evaluar(area_chaside, carrera, perfiles=None):
+    p = (perfil_carreras if perfiles is None else perfiles).get(str(carrera).strip())
+    if not p:
+        return 'Sin perfil definido'
+    if area_chaside in p.get('Fuerte', []):
+        return 'Coherente'
+    if area_chaside in p.get('Baja', []):
+        return 'Requiere Orientación'
+    return 'Neutral'
+
+def carrera_mejor(r, perfiles=None):
+    if r['Respondio_Siempre_Igual']:
+        return 'Información no confiable'
+    a = r['Area_Fuerte_Ponderada']
+    c_actual = str(r[columna_carrera]).strip()
+    perfiles = perfil_carreras if perfiles is None else perfiles
+    sugeridas = [c for c, p in perfiles.items() if a in p.get('Fuerte', [])]
+    return c_actual if c_actual in sugeridas else (', '.join(sugeridas) if sugeridas else 'Sin sugerencia clara')
+
+def diagnostico(r):
+    if r['Carrera_Mejor_Perfilada'] == 'Información no confiable':
+        return 'Información no confiable'
+    if str(r[columna_carrera]).strip() == str(r['Carrera_Mejor_Perfilada']).strip():
+        return 'Perfil adecuado'
+    if r['Carrera_Mejor_Perfilada'] == 'Sin sugerencia clara':
+        return 'Sin sugerencia clara'
+    return f"Sugerencia: {r['Carrera_Mejor_Perfilada']}"
+
+def semaforo(r):
+    diag = r['Diagnóstico Primario Vocacional']
+    if diag == 'Información no confiable':
+        return 'Respondió siempre igual'
+    if diag == 'Sin sugerencia clara':
+        return 'Sin sugerencia'
+    match = r['Coincidencia_Ponderada']
+    if diag == 'Perfil adecuado':
+        return {'Coherente':'Verde','Neutral':'Amarillo','Requiere Orientación':'Rojo'}.get(match, 'Sin sugerencia')
+    if isinstance(diag, str) and diag.startswith('Sugerencia:'):
+        return {'Coherente':'Verde','Neutral':'Amarillo','Requiere Orientación':'Rojo'}.get(match, 'Sin sugerencia')
+    return 'Sin sugerencia'
+
+# Las reglas dependen sólo de (carrera, área fuerte, respondió igual): se evalúan
+# una vez por combinación y cada fila toma su resultado de la tabla.
+columnas_clasificacion = [
+    'Coincidencia_Ponderada',
+    'Carrera_Mejor_Perfilada',
+    'Diagnóstico Primario Vocacional',
+    'Semáforo Vocacional'
+]
+
+def construir_tablas_clasificacion(carreras_unicas, perfiles=None):
+    n = len(carreras_unicas) * len(areas) * 2
+    tablas = {c: np.empty(n, dtype=object) for c in columnas_clasificacion}
+    k = 0
+    for carrera in carreras_unicas:
+        for a in areas:
+            for igual in (False, True):
+                r = {columna_carrera: carrera, 'Area_Fuerte_Ponderada': a, 'Respondio_Siempre_Igual': igual}
+                r['Coincidencia_Ponderada'] = evaluar(a, carrera, perfiles)
+                r['Carrera_Mejor_Perfilada'] = carrera_mejor(r, perfiles)
+                r['Diagnóstico Primario Vocacional'] = diagnostico(r)
+                r['Semáforo Vocacional'] = semaforo(r)
+                for c in columnas_clasificacion:
+                    tablas[c][k] = r[c]
+                k += 1
+    return tablas
+
+def puntajes_area(matriz_items: np.ndarray, respuestas: np.ndarray = None):
+    """
+    Puntajes CHASIDE a partir de la matriz binaria de ítems o, si se indica,
+    de las mismas respuestas empaquetadas (AND + popcount por área).
+    Devuelve (unos por estudiante, intereses, aptitudes, combinado), con una
+    columna por área en cada matriz.
+    """
+    n_items = matriz_items.shape[1]
+    matriz_pesos = construir_matriz_pesos(n_items)
+    if respuestas is not None:
+        # Máscaras: una por área (14) y una con todos los ítems
+        mascaras = empaquetar_respuestas(
+            np.vstack([matriz_pesos.T, np.ones((1, n_items), dtype=np.int64)]).astype(np.uint8)
+        )
+        conteos = contar_unos_empaquetado(respuestas, mascaras)
+        conteos_area, unos_por_estudiante = conteos[:, :-1], conteos[:, -1]
+    else:
+        unos_por_estudiante = matriz_items.sum(axis=1, dtype=np.int64)
+        conteos_area = matriz_items @ matriz_pesos
+    intereses_mat = conteos_area[:, :len(areas)]
+    aptitudes_mat = conteos_area[:, len(areas):]
+    combinado_mat = intereses_mat * peso_intereses + aptitudes_mat * peso_aptitudes
+    return unos_por_estudiante, intereses_mat, aptitudes_mat, combinado_mat
+
+def puntuar_respuestas(df_raw: pd.DataFrame):
+    """
+    Parte por fila del preprocesamiento: normalización, desviación intrapersona
+    y puntajes CHASIDE. No depende de otras filas, por lo que puede aplicarse
+    sólo a respuestas nuevas. Devuelve (df, unos por estudiante, no reconocidas,
+    respuestas empaquetadas).
+    """
+    columnas_items = df_raw.columns[5:103]
+
+    matriz_items, respuestas_no_reconocidas = normalizar_respuestas(df_raw[columnas_items])
+    df = pd.concat([
+        df_raw.iloc[:, :5],
+        pd.DataFrame(matriz_items, index=df_raw.index, columns=columnas_items),
+        df_raw.iloc[:, 103:]
+    ], axis=1)
+
+    respuestas = empaquetar_respuestas(matriz_items)
+    unos_por_estudiante, intereses_mat, aptitudes_mat, combinado_mat = puntajes_area(
+        matriz_items, respuestas if EMPAQUETAR_RESPUESTAS else None
+    )
+
+    # Desviación intrapersona; Respondio_Siempre_Igual depende del umbral global
+    # y se fija en clasificar_respuestas
+    df['Desv_Intrapersona'] = desviacion_intrapersona(matriz_items)
+    df['Respondio_Siempre_Igual'] = False
+
+    nuevas = {}
+    for j, a in enumerate(areas):
+        nuevas[f'INTERES_{a}'] = intereses_mat[:, j]
+        nuevas[f'APTITUD_{a}'] = aptitudes_mat[:, j]
+    for j, a in enumerate(areas):
+        nuevas[f'PUNTAJE_COMBINADO_{a}'] = combinado_mat[:, j]
+        nuevas[f'TOTAL_{a}'] = intereses_mat[:, j] + aptitudes_mat[:, j]
+
+    # argmax devuelve el primer máximo, igual que max(areas, key=...)
+    area_idx = combinado_mat.argmax(axis=1) if len(df) else np.zeros(0, dtype=np.intp)
+    nuevas['Area_Fuerte_Ponderada'] = np.array(areas, dtype=object)[area_idx]
+    nuevas['Score'] = combinado_mat.max(axis=1) if len(df) else np.zeros(0)
+
+    df = pd.concat([df, pd.DataFrame(nuevas, index=df.index)], axis=1)
+    return df, unos_por_estudiante, respuestas_no_reconocidas, respuestas
+
+def calcular_umbral_intrapersonal(desviaciones) -> float:
+    """Cuantil cuantil_intrapersonal de Desv_Intrapersona (interpolación lineal, como Series.quantile)."""
+    desviaciones = np.asarray(desviaciones, dtype=np.float64)
+    if not len(desviaciones):
+        return np.nan
+    return float(np.quantile(desviaciones, cuantil_intrapersonal))
+
+def clasificar_respuestas(df: pd.DataFrame, umbral_intrapersonal: float) -> None:
+    """Fija Respondio_Siempre_Igual y las columnas de clasificación (in place)."""
+    df['Respondio_Siempre_Igual'] = df['Desv_Intrapersona'] <= umbral_intrapersonal
+
+    area_idx = pd.Index(areas).get_indexer(df['Area_Fuerte_Ponderada'])
+    codigos_carrera, carreras_unicas = pd.factorize(df[columna_carrera], use_na_sentinel=False)
+    tablas_clasificacion = construir_tablas_clasificacion(carreras_unicas)
+    clave_clasificacion = (
+        (codigos_carrera * len(areas) + area_idx) * 2
+        + df['Respondio_Siempre_Igual'].to_numpy(dtype=np.int64)
+    )
+    for c in columnas_clasificacion:
+        df[c] = tablas_clasificacion[c][clave_clasificacion]
+
+    df['Carrera_Corta'] = (
+        df[columna_carrera]
+        .astype(str)
+        .str.replace('Ingeniería', 'Ing.', regex=False)
+    )
+
+def preprocesar_chaside(df_raw: pd.DataFrame):
+    """
+    Normaliza respuestas y calcula puntajes CHASIDE y semáforo.
+    No modifica `df_raw`; devuelve (df enriquecido, umbral intrapersonal, respuestas
+    no reconocidas, respuestas empaquetadas).
+    """
+    df, _, respuestas_no_reconocidas, respuestas = puntuar_respuestas(df_raw)
+    umbral = calcular_umbral_intrapersonal(df['Desv_Intrapersona'])
+    clasificar_respuestas(df, umbral)
+    return df, umbral, respuestas_no_reconocidas, respuestas
+
+# ============================================
+# 3) INTENSIDAD VOCACIONAL
+# ============================================
+# Cortes de percentil dentro de (carrera, semáforo): Amarillo ≤ corte_sin_perfil → 'Sin perfil';
+# Verde > corte_joven_promesa → 'Jóven promesa'
+corte_sin_perfil = 0.25
+corte_joven_promesa = 0.75
+
+def calcular_intensidad(
+    df: pd.DataFrame,
+    corte_bajo: float = None,
+    corte_alto: float = None
+) -> pd.Series:
+    """
+    Nivel_Intensidad de cada fila de `df` en una sola pasada (NaN fuera de
+    Verde/Amarillo). El rango percentil de cada estudiante es su posición / tamaño
+    dentro de (carrera, semáforo) ordenando por Score; los empates se resuelven
+    de forma estable por orden de aparición.
+    """
+    corte_bajo = corte_sin_perfil if corte_bajo is None else corte_bajo
+    corte_alto = corte_joven_promesa if corte_alto is None else corte_alto
+
+    semaforo_fila = df['Semáforo Vocacional'].to_numpy(dtype=object)
+    mascara = np.isin(semaforo_fila, ['Verde', 'Amarillo']) & df[columna_carrera].notna().to_numpy()
+    nivel = np.full(len(df), np.nan, dtype=object)
+    if mascara.any():
+        claves = pd.DataFrame({
+            columna_carrera: df[columna_carrera].to_numpy(dtype=object)[mascara],
+            'Semáforo Vocacional': semaforo_fila[mascara],
+            'Score': df['Score'].to_numpy(dtype=np.float64)[mascara]
+        })
+        ordenado = claves.sort_values('Score', kind='stable')
+        grupos = ordenado.groupby([columna_carrera, 'Semáforo Vocacional'], sort=False)
+        rank_pct = ((grupos.cumcount() + 1) / grupos['Score'].transform('size')).sort_index().to_numpy()
+
+        semaforo_int = claves['Semáforo Vocacional'].to_numpy()
+        nivel[mascara] = np.select(
+            [
+                (semaforo_int == 'Amarillo') & (rank_pct <= corte_bajo),
+                semaforo_int == 'Amarillo',
+                (semaforo_int == 'Verde') & (rank_pct > corte_alto)
+            ],
+            ['Sin perfil', 'Perfil en riesgo', 'Jóven promesa'],
+            default='Perfil en transición'
+        )
+    return pd.Series(pd.Categorical(nivel, dtype=tipo_intensidad), index=df.index, name='Nivel_Intensidad')
+
+descripcion_intensidad = {
+    "Sin perfil": "Estudiante cuya elección de carrera no muestra correspondencia con su perfil vocacional.",
+    "Perfil en riesgo": "Estudiante cuyo perfil vocacional presenta una coincidencia mínima con la carrera elegida.",
+    "Perfil en transición": "Estudiante cuya elección profesional y perfil vocacional presentan congruencia, aunque aún en proceso de consolidación.",
+    "Jóven promesa": "Estudiante con alta congruencia entre su perfil vocacional y la carrera elegida."
+}
+tipo_intensidad = pd.CategoricalDtype(list(descripcion_intensidad))
+
+# ============================================
+# 4) DESTINO VOCACIONAL COMPATIBLE
+# ============================================
+def letras_carrera(carrera):
+    perfil = perfil_carreras.get(str(carrera).strip(), {})
+    return perfil.get('Fuerte', [])
+
+def carreras_compatibles(carrera_origen):
+    letras_origen = set(letras_carrera(carrera_origen))
+    compatibles = []
+
+    for carrera_destino in perfil_carreras.keys():
+        if carrera_destino == carrera_origen:
+            continue
+        letras_destino = set(letras_carrera(carrera_destino))
+        inter = letras_origen.intersection(letras_destino)
+        if len(inter) >= 2:
+            compatibles.append(carrera_destino)
+
+    return compatibles
+
+def construir_grafo_compatibilidad():
+    """
+    Precalcula, para los perfiles definidos:
+    - incidencia carrera × posición de letra (índices de área en el orden del perfil,
+      rellenos con una columna de ceros) y número de letras por carrera;
+    - grafo de compatibilidad (carreras que comparten ≥2 letras fuertes).
+    """
+    nombres = list(perfil_carreras)
+    posicion = {c: k for k, c in enumerate(nombres)}
+    max_letras = max((len(letras_carrera(c)) for c in nombres), default=0)
+
+    incidencia = np.full((len(nombres), max_letras), len(areas), dtype=np.intp)
+    n_letras = np.zeros(len(nombres), dtype=np.float64)
+    grafo = np.zeros((len(nombres), len(nombres)), dtype=bool)
+    for k, c in enumerate(nombres):
+        letras = letras_carrera(c)
+        incidencia[k, :len(letras)] = [areas.index(l) for l in letras]
+        n_letras[k] = len(letras)
+        grafo[k, [posicion[d] for d in carreras_compatibles(c)]] = True
+    return nombres, incidencia, n_letras, grafo
+
+def calcular_destino_compatible(df: pd.DataFrame) -> pd.Series:
+    """
+    Destino compatible de cada estudiante: la carrera compatible con mayor puntaje
+    promedio si supera al de su carrera de origen (empates → primera en
+    perfil_carreras); si no, la carrera de origen.
+    """
+    nombres, incidencia, n_letras, grafo = construir_grafo_compatibilidad()
+
+    # Puntaje promedio por carrera (N × carreras). La suma se acumula en el orden de
+    # letras de cada perfil, igual que np.mean, para que las comparaciones y los
+    # empates den exactamente lo mismo que el cálculo fila por fila.
+    combinado = np.zeros((len(df), len(areas) + 1))
+    combinado[:, :len(areas)] = df[score_cols].to_numpy(dtype=np.float64)
+    suma = np.zeros((len(df), len(nombres)))
+    for j in range(incidencia.shape[1]):
+        suma = suma + combinado[:, incidencia[:, j]]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        puntajes = suma / n_letras
+
+    codigos_origen, origenes = pd.factorize(df[columna_carrera].astype(str).str.strip())
+    perfil_de_origen = pd.Index(nombres).get_indexer(origenes)
+    perfil_fila = perfil_de_origen[codigos_origen]
+    con_perfil = perfil_fila >= 0
+
+    destino = np.asarray(origenes, dtype=object)[codigos_origen]
+    if con_perfil.any() and len(nombres):
+        filas = np.flatnonzero(con_perfil)
+        p_origen = perfil_fila[filas]
+        score_origen = puntajes[filas, p_origen]
+        candidatos = np.where(grafo[p_origen], puntajes[filas], -np.inf)
+        mejor = candidatos.argmax(axis=1)
+        supera = candidatos[np.arange(len(filas)), mejor] > score_origen
+        destino[filas[supera]] = np.asarray(nombres, dtype=object)[mejor[supera]]
+    return pd.Series(destino, index=df.index, dtype=object)
+
+# ============================================
+# 5) CONCLUSIÓN Y RECOMENDACIÓN
+# ============================================
+# Plantillas de conclusión: {carrera} y {destino} se sustituyen al final
+conclusion_respondio_igual = (
+    "El patrón de respuestas sugiere baja variabilidad, por lo que el perfil obtenido debe interpretarse con cautela. "
+    "Esto puede indicar que la prueba fue contestada con respuestas muy homogéneas o sin suficiente diferenciación entre intereses y aptitudes. "
+    "Se recomienda reaplicar la prueba en condiciones controladas, explicar nuevamente su propósito y posteriormente realizar una entrevista breve de orientación vocacional."
+)
+
+# nivel → (destino igual a la carrera, destino distinto)
+conclusiones_por_nivel = {
+    'Sin perfil': (
+        "El estudiante muestra una baja correspondencia entre su perfil vocacional y la carrera elegida, sin un ajuste claramente consolidado dentro de {carrera}. "
+        "Se recomienda repetir la prueba para confirmar el resultado y acompañar el proceso con orientación vocacional individual, antes de tomar decisiones académicas definitivas.",
+        "El estudiante muestra una baja correspondencia entre su perfil vocacional y la carrera elegida, sin un ajuste claro dentro de {carrera}. "
+        "Además, el análisis de compatibilidad sugiere mayor afinidad hacia {destino}. "
+        "Se recomienda repetir la prueba para confirmar estabilidad y, si el resultado persiste, canalizar a orientación vocacional para valorar un posible ingreso a una carrera más acorde con su perfil."
+    ),
+    'Perfil en riesgo': (
+        "El estudiante presenta una coincidencia mínima entre su perfil vocacional y la carrera elegida, por lo que existe riesgo de dificultades de adaptación académica, especialmente en asignaturas propias de la carrera. "
+        "Se recomienda seguimiento tutorial, fortalecimiento de hábitos de estudio y una revisión vocacional complementaria durante el primer semestre.",
+        "El estudiante presenta una coincidencia mínima entre su perfil vocacional y la carrera elegida, lo que puede traducirse en dificultades posteriores de adaptación a asignaturas propias de la formación profesional. "
+        "El análisis compatible sugiere mejor ajuste hacia {destino}. "
+        "Se recomienda seguimiento tutorial temprano, orientación vocacional y valorar, de manera informada, una posible transición hacia una carrera más acorde con su perfil."
+    ),
+    'Perfil en transición': (
+        "El estudiante presenta una congruencia vocacional adecuada con la carrera elegida, aunque aún en consolidación. "
+        "Se recomienda mantener un acompañamiento preventivo, reforzar hábitos académicos y dar seguimiento durante el primer semestre para favorecer la permanencia.",
+        "El estudiante muestra una congruencia vocacional funcional con la carrera elegida, aunque todavía en proceso de consolidación. "
+        "Sin embargo, el análisis compatible también identifica afinidad con {destino}. "
+        "Se recomienda mantener el acompañamiento académico y realizar una exploración vocacional complementaria, sin asumir de inmediato un cambio de carrera."
+    ),
+    'Jóven promesa': (
+        "El estudiante presenta una alta congruencia entre su perfil vocacional y la carrera elegida, lo que sugiere condiciones favorables para un buen ajuste y permanencia académica. "
+        "Se recomienda fortalecer su trayectoria, promover actividades de alto desempeño y considerar su incorporación a espacios de liderazgo, mentoría o desarrollo académico avanzado.",
+        "El estudiante presenta una alta congruencia entre su perfil vocacional y la carrera elegida, lo que favorece condiciones de buen ajuste académico. "
+        "Aunque el análisis compatible detecta afinidad con {destino}, no se considera prioritario promover una transición, sino fortalecer su permanencia y potenciar su desarrollo dentro de la carrera actual."
+    ),
+}
+
+# Sin nivel de intensidad: según el semáforo
+conclusiones_por_semaforo = {
+    'Verde': "El perfil identificado coincide con la carrera elegida. Se recomienda mantener acompañamiento preventivo y reforzar estrategias de permanencia académica.",
+    'Amarillo': "El perfil identificado no coincide plenamente con la carrera elegida. Se recomienda orientación vocacional, seguimiento tutorial y revisión temprana de ajuste académico.",
+}
+conclusion_otro = (
+    "El resultado obtenido sugiere la necesidad de una interpretación complementaria mediante entrevista de orientación y seguimiento académico inicial."
+)
+
+def plantilla_conclusion(categoria, respondio_igual: bool, nivel_alumno, destino_difiere: bool) -> str:
+    if respondio_igual or categoria == 'Respondió siempre igual':
+        return conclusion_respondio_igual
+    if nivel_alumno in conclusiones_por_nivel:
+        return conclusiones_por_nivel[nivel_alumno][int(bool(destino_difiere))]
+    return conclusiones_por_semaforo.get(categoria, conclusion_otro)
+
+def construir_conclusion_recomendacion(al, carrera_sel, destino_compatible, nivel_alumno):
+    plantilla = plantilla_conclusion(
+        al['Semáforo Vocacional'],
+        bool(al.get('Respondio_Siempre_Igual', False)),
+        nivel_alumno,
+        destino_compatible != carrera_sel
+    )
+    return plantilla.format(carrera=carrera_sel, destino=destino_compatible)
+
+# Tabla precompilada (nivel, semáforo, destino distinto) → plantilla para toda la cohorte.
+# El último índice de nivel y de semáforo agrupa "sin nivel" y "otra categoría".
+niveles_conclusion = list(conclusiones_por_nivel)
+semaforos_conclusion = ['Respondió siempre igual'] + list(conclusiones_por_semaforo)
+
+def construir_indice_plantillas():
+    plantillas, tabla = [], np.zeros((len(niveles_conclusion) + 1, len(semaforos_conclusion) + 1, 2), dtype=np.intp)
+    for n, nivel in enumerate(niveles_conclusion + [None]):
+        for c, categoria in enumerate(semaforos_conclusion + [None]):
+            for d in (0, 1):
+                plantilla = plantilla_conclusion(categoria, False, nivel, d)
+                if plantilla not in plantillas:
+                    plantillas.append(plantilla)
+                tabla[n, c, d] = plantillas.index(plantilla)
+    return plantillas, tabla
+
+plantillas_conclusion, indice_plantillas = construir_indice_plantillas()
+
+cat_map_largo = {
+    'Verde': 'El perfil coincide con la carrera elegida',
+    'Amarillo': 'El perfil NO va acorde con la carrera elegida',
+    'Rojo': 'No se observa un perfil prioritario',
+    'Sin sugerencia': 'No se observa un perfil prioritario',
+    'Respondió siempre igual': 'Respondió siempre igual'
+}
+
+def texto_ubicacion_reporte(
+    categoria_larga, n_global_cat, pct_global_cat,
+    carrera_sel, n_carrera_cat, pct_carrera_cat,
+    nivel_alumno, texto_intensidad, destino_compatible
+) -> str:
+    return (
+        f"Distribución general del estudiantado: el estudiante pertenece a la categoría {categoria_larga}, "
+        f"la cual concentra {n_global_cat} estudiantes ({pct_global_cat:.1f}%) del total evaluado.\n"
+        f"Distribución por carrera y categoría: dentro de {carrera_sel}, el estudiante se ubica en la categoría "
+        f"{categoria_larga}, grupo conformado por {n_carrera_cat} estudiantes ({pct_carrera_cat:.1f}%) de su carrera.\n"
+        f"Intensidad del perfil vocacional por carrera: el estudiante fue clasificado como "
+        f"{nivel_alumno if pd.notna(nivel_alumno) else 'No disponible'}. {texto_intensidad}\n"
+        f"Transición vocacional compatible por carrera: "
+        f"{'El perfil del estudiante se mantiene dentro de la carrera elegida.' if destino_compatible == carrera_sel else f'El perfil del estudiante presenta mejor ajuste hacia {destino_compatible}.'}"
+    )
+
+def nombre_archivo_pdf(estudiante: str) -> str:
+    return f"perfil_CHASIDE_{estudiante.replace(' ', '_')}.pdf"
+
+def tareas_reportes(df: pd.DataFrame, carrera=None, cubo=None):
+    """
+    Genera (nombre_archivo, campos de build_pdf_report) para cada estudiante de
+    `carrera` (o de toda la cohorte), con los mismos textos que el reporte individual.
+    Los conteos salen de `cubo` (construir_cubo) si se da; si no, se construye.
+    """
+    base = df[df[columna_carrera].notna()]
+    if carrera is not None:
+        base = base[base[columna_carrera] == carrera]
+
+    resumen = resumen_cubo(cubo if cubo is not None else construir_cubo(df))
+
+    columnas = [columna_carrera, columna_nombre, 'Semáforo Vocacional',
+                'Respondio_Siempre_Igual', 'Destino_Compatible', 'Nivel_Intensidad']
+    for idx, al in zip(base.index, base[columnas].to_dict('records')):
+        carrera_al = str(al[columna_carrera])
+        categoria = al['Semáforo Vocacional']
+        categoria_larga = cat_map_largo.get(categoria, categoria)
+        nivel_alumno = al['Nivel_Intensidad']
+
+        n_global_cat = resumen['conteo_global'].get(categoria, 0)
+        pct_global_cat = (n_global_cat / resumen['n_total'] * 100) if resumen['n_total'] else 0
+        n_carrera = resumen['n_carrera'].get(al[columna_carrera], 0)
+        n_carrera_cat = resumen['conteo_carrera'].get(al[columna_carrera], {}).get(categoria, 0)
+        pct_carrera_cat = (n_carrera_cat / n_carrera * 100) if n_carrera else 0
+
+        if pd.notna(nivel_alumno):
+            texto_intensidad = descripcion_intensidad.get(nivel_alumno, nivel_alumno)
+        else:
+            texto_intensidad = "No fue posible determinar el nivel de intensidad vocacional para este estudiante."
+
+        estudiante = str(al[columna_nombre])
+        yield f"{idx}_{nombre_archivo_pdf(estudiante)}", dict(
+            estudiante=estudiante,
+            carrera=carrera_al,
+            categoria=categoria_larga,
+            intensidad=nivel_alumno if pd.notna(nivel_alumno) else "No disponible",
+            texto_ubicacion=texto_ubicacion_reporte(
+                categoria_larga, n_global_cat, pct_global_cat,
+                carrera_al, n_carrera_cat, pct_carrera_cat,
+                nivel_alumno, texto_intensidad, al['Destino_Compatible']
+            ),
+            conclusion_txt=construir_conclusion_recomendacion(
+                al=al,
+                carrera_sel=carrera_al,
+                destino_compatible=al['Destino_Compatible'],
+                nivel_alumno=nivel_alumno
+            )
+        )
+
+# ============================================
+# 6) CUBO DE DISTRIBUCIÓN
+# ============================================
+# Conteos materializados por carrera × semáforo × nivel × destino: unas cuantas
+# filas por carrera, de donde salen los textos de ubicación y el panorama.
+columnas_cubo = [columna_carrera, 'Semáforo Vocacional', 'Nivel_Intensidad', 'Destino_Compatible']
+
+def construir_cubo(df: pd.DataFrame) -> pd.DataFrame:
+    """Una fila por combinación presente de columnas_cubo con su conteo en 'n'."""
+    # Claves como object: con columnas Categorical el groupby agregaría combinaciones ausentes
+    claves = pd.DataFrame({c: df[c].to_numpy(dtype=object) for c in columnas_cubo})
+    return claves.groupby(columnas_cubo, sort=False, dropna=False).size().rename('n').reset_index()
+
+def actualizar_cubo(cubo: pd.DataFrame, df: pd.DataFrame, carreras) -> pd.DataFrame:
+    """Reemplaza en `cubo` las filas de `carreras` con sus conteos actuales en `df`."""
+    return pd.concat([
+        cubo[~cubo[columna_carrera].isin(carreras)],
+        construir_cubo(df[df[columna_carrera].isin(carreras)])
+    ], ignore_index=True)
+
+def resumen_cubo(cubo: pd.DataFrame) -> dict:
+    """Conteos por semáforo, globales y por carrera, para los textos de ubicación."""
+    conteo_carrera = {}
+    por_carrera = cubo.groupby([columna_carrera, 'Semáforo Vocacional'], sort=False)['n'].sum()
+    for (carrera, categoria), n in por_carrera.items():
+        conteo_carrera.setdefault(carrera, {})[categoria] = int(n)
+    return {
+        'conteo_global': {k: int(n) for k, n in cubo.groupby('Semáforo Vocacional', sort=False)['n'].sum().items()},
+        'conteo_carrera': conteo_carrera,
+        'n_carrera': {c: sum(v.values()) for c, v in conteo_carrera.items()},
+        'n_total': int(cubo['n'].sum())
+    }
+
+def panorama_cubo(cubo: pd.DataFrame) -> dict:
+    """Tablas del panorama de la cohorte (carrera en filas), derivadas sólo del cubo."""
+    orden_semaforo = [c for c in ['Verde', 'Amarillo', 'Rojo', 'Sin sugerencia', 'Respondió siempre igual']
+                      if c in set(cubo['Semáforo Vocacional'])]
+    orden_semaforo += sorted(set(cubo['Semáforo Vocacional']) - set(orden_semaforo), key=str)
+
+    semaforo = cubo.pivot_table(index=columna_carrera, columns='Semáforo Vocacional', values='n',
+                                aggfunc='sum', fill_value=0).reindex(columns=orden_semaforo, fill_value=0)
+    semaforo['Total'] = semaforo.sum(axis=1)
+
+    niveles = cubo.assign(Nivel_Intensidad=cubo['Nivel_Intensidad'].fillna('Sin nivel'))
+    nivel = niveles.pivot_table(index=columna_carrera, columns='Nivel_Intensidad', values='n',
+                                aggfunc='sum', fill_value=0)
+    orden_nivel = [n for n in list(descripcion_intensidad) + ['Sin nivel'] if n in nivel.columns]
+    nivel = nivel.reindex(columns=orden_nivel + [c for c in nivel.columns if c not in orden_nivel])
+
+    cambios = cubo[cubo['Destino_Compatible'] != cubo[columna_carrera]]
+    transiciones = (
+        cambios.pivot_table(index=columna_carrera, columns='Destino_Compatible', values='n',
+                            aggfunc='sum', fill_value=0)
+        if not cambios.empty else pd.DataFrame()
+    )
+    total = int(cubo['n'].sum())
+    return {
+        'n_total': total,
+        'conteo_semaforo': semaforo.drop(columns='Total').sum().to_dict(),
+        'semaforo_por_carrera': semaforo,
+        'nivel_por_carrera': nivel,
+        'transiciones': transiciones,
+        'n_con_destino_distinto': int(cambios['n'].sum())
+    }
+
+# ============================================
+# 7) ANÁLISIS COMPLETO E INGESTA INCREMENTAL
+# ============================================
+# Tipos del df que queda en memoria (uno por análisis en caché, compartido por las
+# sesiones): conteos en uint8, puntajes combinados en float32 y etiquetas repetidas,
+# incluida la carrera elegida, como Categorical. Score y Desv_Intrapersona siguen en
+# float64: ordenan la intensidad y se comparan con el umbral, y en float32 cambiarían
+# empates y clasificaciones.
+columnas_conteo = [f'{prefijo}_{a}' for prefijo in ('INTERES', 'APTITUD', 'TOTAL') for a in areas]
+columnas_etiqueta = [
+    columna_carrera, 'Area_Fuerte_Ponderada', *columnas_clasificacion, 'Carrera_Corta',
+    'Destino_Compatible', columna_fuente
+]
+
+def compactar_tipos(df: pd.DataFrame) -> None:
+    """Aplica los tipos compactos (in place); las columnas ausentes o ya compactas se omiten."""
+    tipos = {
+        **{c: np.dtype(np.uint8) for c in columnas_conteo},
+        **{c: np.dtype(np.float32) for c in score_cols},
+        'Nivel_Intensidad': tipo_intensidad
+    }
+    for c, tipo in tipos.items():
+        if c in df.columns and df[c].dtype != tipo:
+            df[c] = df[c].astype(tipo)
+    for c in columnas_etiqueta:
+        if c in df.columns and not isinstance(df[c].dtype, pd.CategoricalDtype):
+            df[c] = df[c].astype('category')
+
+def memoria_por_columna(df: pd.DataFrame) -> pd.DataFrame:
+    """Bytes por columna de `df` (incluye el contenido de los textos), de mayor a menor."""
+    uso = df.memory_usage(deep=True, index=False)
+    total = int(uso.sum())
+    reporte = pd.DataFrame({
+        'Columna': uso.index,
+        'Tipo': [str(df[c].dtype) for c in uso.index],
+        'Bytes': uso.to_numpy(),
+        'Bytes por estudiante': uso.to_numpy() / max(len(df), 1),
+        '% del total': uso.to_numpy() / total * 100 if total else 0.0
+    })
+    return reporte.sort_values('Bytes', ascending=False, kind='stable', ignore_index=True)
+
+def sin_items(df: pd.DataFrame, df_raw: pd.DataFrame) -> pd.DataFrame:
+    """Con EMPAQUETAR_RESPUESTAS, el df en memoria deja los ítems a las respuestas empaquetadas."""
+    return df.drop(columns=df_raw.columns[5:103]) if EMPAQUETAR_RESPUESTAS else df
+
+def huella_fila(df_raw: pd.DataFrame, posicion: int) -> int:
+    return int(pd.util.hash_pandas_object(df_raw.iloc[[posicion]], index=False).iloc[0])
+
+def iniciar_estado(df_raw: pd.DataFrame, registro=None) -> dict:
+    """
+    Analiza la hoja completa y guarda lo necesario para añadir filas después.
+    `registro` (perfilado.iniciar_registro) mide cada etapa si no es None.
+    """
+    with etapa(registro, "preprocesamiento", len(df_raw)):
+        df, umbral, respuestas_no_reconocidas, respuestas = preprocesar_chaside(df_raw)
+        df = sin_items(df, df_raw)
+    with etapa(registro, "destino_compatible", len(df)):
+        df['Destino_Compatible'] = calcular_destino_compatible(df)
+    with etapa(registro, "intensidad", len(df)):
+        df['Nivel_Intensidad'] = calcular_intensidad(df)
+    with etapa(registro, "tipos_compactos", len(df)):
+        compactar_tipos(df)
+    with etapa(registro, "cubo", len(df)):
+        cubo = construir_cubo(df)
+    return {
+        'df': df,
+        'cubo': cubo,
+        'respuestas': respuestas,
+        'respuestas_no_reconocidas': respuestas_no_reconocidas,
+        'umbral_intrapersonal': umbral,
+        'columnas': list(df_raw.columns),
+        'filas_procesadas': len(df_raw),
+        'huella_ultima_fila': huella_fila(df_raw, len(df_raw) - 1) if len(df_raw) else None
+    }
+
+def actualizar_estado(estado: dict, df_raw: pd.DataFrame, registro=None) -> dict:
+    """
+    Incorpora las filas de `df_raw` posteriores a la marca `filas_procesadas`.
+    Sólo se puntúan las filas nuevas; el umbral intrapersonal se actualiza desde
+    el histograma y la intensidad se recalcula sólo en las carreras afectadas.
+    Si la hoja se acortó, cambió de columnas o la última fila procesada ya no
+    coincide (la hoja se asume de sólo inserción al final), se analiza completa.
+    """
+    n_prev = estado['filas_procesadas']
+    if (
+        len(df_raw) < n_prev
+        or list(df_raw.columns) != estado['columnas']
+        or (n_prev and huella_fila(df_raw, n_prev - 1) != estado['huella_ultima_fila'])
+    ):
+        return iniciar_estado(df_raw, registro)
+    if len(df_raw) == n_prev:
+        return estado
+
+    with etapa(registro, "preprocesamiento", len(df_raw) - n_prev):
+        nuevas, _, no_reconocidas, respuestas = puntuar_respuestas(df_raw.iloc[n_prev:])
+        nuevas = sin_items(nuevas, df_raw)
+        df_prev = estado['df']
+        umbral = calcular_umbral_intrapersonal(np.concatenate([
+            df_prev['Desv_Intrapersona'].to_numpy(), nuevas['Desv_Intrapersona'].to_numpy()]))
+        clasificar_respuestas(nuevas, umbral)
+
+        cambiadas = df_prev.index[:0]
+        if not np.array_equal([umbral], [estado['umbral_intrapersonal']], equal_nan=True):
+            # El umbral cambió: sólo se reclasifican filas cuyo Respondio_Siempre_Igual cambia
+            antes = df_prev['Respondio_Siempre_Igual'].to_numpy()
+            cambiadas = df_prev.index[antes != (df_prev['Desv_Intrapersona'].to_numpy() <= umbral)]
+            if len(cambiadas):
+                df_prev = df_prev.copy()
+                bloque = df_prev.loc[cambiadas].copy()
+                clasificar_respuestas(bloque, umbral)
+                # Las etiquetas reclasificadas pueden no estar entre las categorías actuales
+                reclasificadas = [*columnas_clasificacion, 'Carrera_Corta']
+                df_prev[reclasificadas] = df_prev[reclasificadas].astype(object)
+                df_prev.loc[cambiadas, bloque.columns] = bloque
+
+    with etapa(registro, "destino_compatible", len(nuevas)):
+        nuevas['Destino_Compatible'] = calcular_destino_compatible(nuevas)
+
+    df = pd.concat([df_prev, nuevas])
+
+    carreras_afectadas = pd.unique(pd.concat([
+        nuevas[columna_carrera], df_prev.loc[cambiadas, columna_carrera]
+    ]))
+    afectadas = df[columna_carrera].isin(carreras_afectadas)
+    with etapa(registro, "intensidad", int(afectadas.sum())):
+        df['Nivel_Intensidad'] = df['Nivel_Intensidad'].astype(tipo_intensidad)
+        df.loc[afectadas, 'Nivel_Intensidad'] = calcular_intensidad(df[afectadas])
+    with etapa(registro, "tipos_compactos", len(df)):
+        compactar_tipos(df)
+    # Las filas nuevas y las reclasificadas pertenecen a carreras afectadas
+    with etapa(registro, "cubo", int(afectadas.sum())):
+        cubo = actualizar_cubo(estado['cubo'], df, carreras_afectadas)
+
+    respuestas_no_reconocidas = dict(estado['respuestas_no_reconocidas'])
+    for token, n in no_reconocidas.items():
+        respuestas_no_reconocidas[token] = respuestas_no_reconocidas.get(token, 0) + n
+
+    return {
+        'df': df,
+        'cubo': cubo,
+        'respuestas': np.concatenate([estado['respuestas'], respuestas], axis=1),
+        'respuestas_no_reconocidas': respuestas_no_reconocidas,
+        'umbral_intrapersonal': umbral,
+        'columnas': estado['columnas'],
+        'filas_procesadas': len(df_raw),
+        'huella_ultima_fila': huella_fila(df_raw, len(df_raw) - 1)
+    }
+
+# ============================================
+# 8) ANÁLISIS DE SENSIBILIDAD (PESOS Y PERFILES)
+# ============================================
+# Todas las configuraciones (pares de pesos × conjuntos de perfiles) se evalúan
+# juntas: el puntaje combinado es un arreglo configuración × estudiante × área
+# (por bloques de estudiantes) y la intensidad se ordena en una sola pasada.
+categorias_semaforo = ['Verde', 'Amarillo', 'Rojo', 'Sin sugerencia', 'Respondió siempre igual']
+categorias_nivel = list(descripcion_intensidad) + ['Sin nivel']
+ELEMENTOS_BLOQUE_SENSIBILIDAD = 1 << 23
+
+def interpretar_pesos(texto: str) -> list:
+    """«0.8/0.2, 0.7/0.3» → [(0.8, 0.2), (0.7, 0.3)]; un solo número p equivale a p/(1 - p)."""
+    pares = []
+    for parte in texto.replace(";", ",").split(","):
+        parte = parte.strip()
+        if not parte:
+            continue
+        try:
+            if "/" in parte:
+                pi, pa = (float(x) for x in parte.split("/"))
+            else:
+                pi = float(parte)
+                pa = round(1 - pi, 10)
+        except ValueError:
+            raise ValueError(f"par de pesos no válido: «{parte}»") from None
+        if (pi, pa) not in pares:
+            pares.append((pi, pa))
+    return pares
+
+def interpretar_perfiles(texto: str) -> dict:
+    """
+    JSON {nombre del conjunto: {carrera: [letras fuertes] o {"Fuerte": [...], "Baja": [...]}}}.
+    Cada conjunto redefine sólo las carreras que menciona; las demás conservan
+    perfil_carreras. Devuelve los conjuntos completos con la forma de perfil_carreras.
+    """
+    if not texto.strip():
+        return {}
+    try:
+        conjuntos = json.loads(texto)
+    except ValueError as e:
+        raise ValueError(f"JSON de perfiles no válido: {e}") from None
+    if not isinstance(conjuntos, dict):
+        raise ValueError("los perfiles deben ser un objeto {nombre: {carrera: letras}}")
+    salida = {}
+    for nombre, perfiles in conjuntos.items():
+        if not isinstance(perfiles, dict):
+            raise ValueError(f"el conjunto «{nombre}» debe ser un objeto {{carrera: letras}}")
+        salida[nombre] = dict(perfil_carreras)
+        for carrera, perfil in perfiles.items():
+            perfil = {'Fuerte': perfil} if isinstance(perfil, list) else perfil
+            if not isinstance(perfil, dict) or any(
+                not isinstance(v, list) or any(l not in areas for l in v) for v in perfil.values()
+            ):
+                raise ValueError(f"perfil no válido para «{carrera}» en «{nombre}»: use letras de {''.join(areas)}")
+            salida[nombre][carrera] = perfil
+    return salida
+
+def niveles_lote(semaforo: np.ndarray, score: np.ndarray, codigos_carrera: np.ndarray, carrera_valida: np.ndarray) -> np.ndarray:
+    """
+    Nivel de intensidad (códigos de categorias_nivel) para cada configuración × estudiante,
+    con las mismas reglas que calcular_intensidad: rango percentil dentro de
+    (configuración, carrera, semáforo) ordenando por Score, empates por orden de aparición.
+    """
+    verde, amarillo = categorias_semaforo.index('Verde'), categorias_semaforo.index('Amarillo')
+    nivel = np.full(semaforo.shape, categorias_nivel.index('Sin nivel'), dtype=np.int8)
+    configuracion, fila = np.nonzero(((semaforo == verde) | (semaforo == amarillo)) & carrera_valida)
+    if not len(fila):
+        return nivel
+    es_verde = semaforo[configuracion, fila] == verde
+    grupo = (configuracion * (codigos_carrera.max() + 1) + codigos_carrera[fila]) * 2 + es_verde
+
+    orden = np.lexsort((fila, score[configuracion, fila], grupo))
+    grupo_ordenado = grupo[orden]
+    inicios = np.flatnonzero(np.r_[True, grupo_ordenado[1:] != grupo_ordenado[:-1]])
+    tamanos = np.diff(np.r_[inicios, len(orden)])
+    rank_pct = np.empty(len(orden))
+    rank_pct[orden] = (np.arange(len(orden)) - np.repeat(inicios, tamanos) + 1) / np.repeat(tamanos, tamanos)
+
+    nivel[configuracion, fila] = np.select(
+        [
+            ~es_verde & (rank_pct <= corte_sin_perfil),
+            ~es_verde,
+            es_verde & (rank_pct > corte_joven_promesa)
+        ],
+        [categorias_nivel.index(n) for n in ('Sin perfil', 'Perfil en riesgo', 'Jóven promesa')],
+        default=categorias_nivel.index('Perfil en transición')
+    )
+    return nivel
+
+def evaluar_sensibilidad(df: pd.DataFrame, pesos: list, perfiles: dict = None) -> dict:
+    """
+    Clasifica la cohorte ya puntuada bajo cada par de pesos (intereses, aptitudes) y
+    cada conjunto de perfiles. La configuración 0 es la vigente (peso_intereses,
+    peso_aptitudes, perfil_carreras). Devuelve configuraciones, códigos de semáforo
+    y nivel (configuración × estudiante) y un resumen con los cambios respecto a la vigente.
+    """
+    pares = [(peso_intereses, peso_aptitudes)] + [p for p in pesos if p != (peso_intereses, peso_aptitudes)]
+    conjuntos = {'Vigentes': perfil_carreras, **(perfiles or {})}
+    n = len(df)
+
+    # Área fuerte y Score por par de pesos: (pares × bloque × áreas) por bloques de estudiantes
+    intereses = df[[f'INTERES_{a}' for a in areas]].to_numpy(dtype=np.float64)
+    aptitudes = df[[f'APTITUD_{a}' for a in areas]].to_numpy(dtype=np.float64)
+    w_intereses = np.array([p[0] for p in pares])[:, None, None]
+    w_aptitudes = np.array([p[1] for p in pares])[:, None, None]
+    area_idx = np.empty((len(pares), n), dtype=np.intp)
+    score = np.empty((len(pares), n))
+    bloque = max(1, ELEMENTOS_BLOQUE_SENSIBILIDAD // (len(pares) * len(areas)))
+    for inicio in range(0, n, bloque):
+        tramo = slice(inicio, inicio + bloque)
+        combinado = intereses[None, tramo] * w_intereses + aptitudes[None, tramo] * w_aptitudes
+        area_idx[:, tramo] = combinado.argmax(axis=2)
+        score[:, tramo] = combinado.max(axis=2)
+
+    # Semáforo por (conjunto de perfiles, par de pesos) desde la tabla de clasificación
+    codigos_carrera, carreras_unicas = pd.factorize(df[columna_carrera], use_na_sentinel=False)
+    respondio = df['Respondio_Siempre_Igual'].to_numpy(dtype=np.int64)
+    configuraciones, semaforo, score_config = [], [], []
+    for nombre, perfiles_conjunto in conjuntos.items():
+        tabla = construir_tablas_clasificacion(carreras_unicas, perfiles_conjunto)['Semáforo Vocacional']
+        codigos_tabla = np.array([categorias_semaforo.index(c) for c in tabla], dtype=np.int8)
+        for k, (pi, pa) in enumerate(pares):
+            semaforo.append(codigos_tabla[(codigos_carrera * len(areas) + area_idx[k]) * 2 + respondio])
+            score_config.append(k)
+            configuraciones.append({
+                'Configuración': f"{pi:g}/{pa:g} · {nombre}",
+                'peso_intereses': pi, 'peso_aptitudes': pa, 'Perfiles': nombre
+            })
+    semaforo = np.vstack(semaforo) if semaforo else np.empty((0, n), dtype=np.int8)
+    carrera_valida = df[columna_carrera].notna().to_numpy()
+    nivel = niveles_lote(semaforo, score[score_config], codigos_carrera, carrera_valida)
+
+    resumen = pd.DataFrame(configuraciones)
+    for j, c in enumerate(categorias_semaforo):
+        resumen[c] = (semaforo == j).sum(axis=1)
+    for j, c in enumerate(categorias_nivel):
+        resumen[c] = (nivel == j).sum(axis=1)
+    resumen['Cambian semáforo'] = (semaforo != semaforo[:1]).sum(axis=1)
+    resumen['Cambian nivel'] = (nivel != nivel[:1]).sum(axis=1)
+    return {'configuraciones': configuraciones, 'semaforo': semaforo, 'nivel': nivel, 'resumen': resumen}
+
+def transiciones_sensibilidad(resultado: dict, k: int, campo: str = 'semaforo') -> pd.DataFrame:
+    """Conteos vigente (filas) → configuración k (columnas) de 'semaforo' o 'nivel'."""
+    categorias = categorias_semaforo if campo == 'semaforo' else categorias_nivel
+    codigos = resultado[campo]
+    conteos = np.bincount(
+        codigos[0].astype(np.intp) * len(categorias) + codigos[k], minlength=len(categorias) ** 2
+    ).reshape(len(categorias), len(categorias))
+    return pd.DataFrame(conteos, index=pd.Index(categorias, name='Vigente'),
+                        columns=pd.Index(categorias, name=resultado['configuraciones'][k]['Configuración']))
+
+# ============================================
+# 9) ESTUDIANTES CON RESPUESTAS SIMILARES
+# ============================================
+# Usa las respuestas empaquetadas del estado (palabras × N, ver sección 2): la
+# distancia de Hamming entre dos estudiantes es el popcount del XOR. Con distancias
+# enteras en 0..98, el top-k sale de un histograma (sin ordenar la cohorte).
+BLOQUE_SIMILITUD = 1 << 16
+
+def construir_indice_similitud(df: pd.DataFrame, respuestas: np.ndarray, n_items: int) -> dict:
+    """Respuestas empaquetadas del estado (sin copiarlas) y códigos de carrera de un df analizado."""
+    codigos_carrera, carreras_unicas = pd.factorize(df[columna_carrera])
+    return {
+        'palabras': respuestas,
+        'n_items': n_items,
+        'codigos_carrera': codigos_carrera,
+        'carreras': pd.Index([str(c) for c in carreras_unicas])
+    }
+
+def distancias_hamming(indice: dict, posicion: int, candidatos: np.ndarray = None) -> np.ndarray:
+    """Respuestas distintas (uint8) entre el estudiante `posicion` y cada candidato (o toda la cohorte)."""
+    palabras = indice['palabras'] if candidatos is None else indice['palabras'][:, candidatos]
+    consulta = indice['palabras'][:, posicion]
+    n = palabras.shape[1]
+    distancias = np.zeros(n, dtype=np.uint8)
+    xor = np.empty(min(n, BLOQUE_SIMILITUD), dtype=np.uint64)
+    for inicio in range(0, n, BLOQUE_SIMILITUD):
+        fin = min(inicio + BLOQUE_SIMILITUD, n)
+        for j in range(palabras.shape[0]):
+            np.bitwise_xor(palabras[j, inicio:fin], consulta[j], out=xor[:fin - inicio])
+            distancias[inicio:fin] += popcount64(xor[:fin - inicio])
+    return distancias
+
+def estudiantes_similares(indice: dict, posicion: int, k: int = 10, carrera=None):
+    """
+    Posiciones y distancias de los k estudiantes con respuestas más parecidas a las
+    de `posicion` (sin incluirlo), opcionalmente sólo de `carrera`. Empates por
+    orden de aparición.
+    """
+    if carrera is None:
+        candidatos = None
+    else:
+        codigo = indice['carreras'].get_indexer([carrera])[0]
+        candidatos = np.flatnonzero(indice['codigos_carrera'] == codigo) if codigo >= 0 else np.array([], dtype=np.intp)
+    distancias = distancias_hamming(indice, posicion, candidatos)
+    filas = np.arange(len(distancias)) if candidatos is None else candidatos
+    propia = np.flatnonzero(filas == posicion)
+    if len(propia):
+        distancias[propia] = indice['n_items'] + 1   # fuera del rango de distancias válidas
+
+    k = min(k, len(distancias) - len(propia))
+    if k <= 0:
+        return np.array([], dtype=np.intp), np.array([], dtype=np.uint8)
+    # Distancia de corte desde el histograma: sólo se ordenan las filas que la alcanzan
+    acumulado = np.cumsum(np.bincount(distancias, minlength=indice['n_items'] + 2))
+    corte = int(np.searchsorted(acumulado, k))
+    seleccion = np.flatnonzero(distancias <= corte)
+    seleccion = seleccion[np.argsort(distancias[seleccion], kind='stable')][:k]
+    return filas[seleccion], distancias[seleccion]
+
+def tabla_similares(df: pd.DataFrame, posiciones: np.ndarray, distancias: np.ndarray, n_items: int = 98) -> pd.DataFrame:
+    """Carrera, semáforo, nivel y destino de los estudiantes similares, con su coincidencia."""
+    columnas = [columna_nombre, columna_carrera, 'Semáforo Vocacional', 'Nivel_Intensidad', 'Destino_Compatible']
+    salida = df.iloc[posiciones][columnas].reset_index(drop=True)
+    salida['Respuestas distintas'] = distancias.astype(int)
+    salida['Coincidencia %'] = ((n_items - salida['Respuestas distintas']) / n_items * 100).round(1)
+    return salida
+
+# ============================================
+# 10) BÚSQUEDA DE ESTUDIANTES POR NOMBRE
+# ============================================
+# Índice sobre los nombres distintos, normalizados sin acentos ni mayúsculas:
+# palabras ordenadas (búsqueda por prefijo con searchsorted) y listas de palabras
+# distintas por trigrama (coincidencia aproximada palabra a palabra). Se arma una vez
+# por versión del análisis; cada consulta sólo toca los rangos de sus palabras y las
+# listas de sus trigramas. Las filas sin nombre no se indexan.
+UMBRAL_TRIGRAMAS = 0.5
+BLOQUE_TRIGRAMAS = 50_000
+FIN_PREFIJO = '\U0010ffff'   # mayor que cualquier carácter: cierra el rango de un prefijo
+patron_diacriticos = re.compile(r"[\u0300-\u036f]")
+patron_separadores = re.compile(r"[\W_]+")
+
+def normalizar_nombre(texto) -> str:
+    """'  José  MARÍA-Peña ' → 'jose maria pena'."""
+    texto = patron_diacriticos.sub("", unicodedata.normalize("NFKD", str(texto))).casefold()
+    return patron_separadores.sub(" ", texto).strip()
+
+def trigramas(nombres: np.ndarray):
+    """
+    Trigramas de ' nombre ' para cada elemento de un arreglo de texto: (índice del
+    nombre, código int64 con los tres caracteres en 21 bits cada uno).
+    """
+    indices, codigos = [], []
+    for inicio in range(0, len(nombres), BLOQUE_TRIGRAMAS):
+        bloque = np.char.add(np.char.add(' ', nombres[inicio:inicio + BLOQUE_TRIGRAMAS].astype(str)), ' ')
+        ancho = bloque.dtype.itemsize // 4
+        if ancho < 3:
+            continue
+        caracteres = bloque.view(np.uint32).reshape(len(bloque), ancho).astype(np.int64)
+        codigo = (caracteres[:, :-2] << 42) | (caracteres[:, 1:-1] << 21) | caracteres[:, 2:]
+        fila, posicion = np.nonzero(np.arange(ancho - 2) < (np.char.str_len(bloque) - 2)[:, None])
+        indices.append(fila + inicio)
+        codigos.append(codigo[fila, posicion])
+    if not indices:
+        return np.array([], dtype=np.intp), np.array([], dtype=np.int64)
+    return np.concatenate(indices), np.concatenate(codigos)
+
+def construir_indice_nombres(df: pd.DataFrame) -> dict:
+    """Índice de búsqueda sobre columna_nombre de un df analizado (posiciones de fila)."""
+    # Sin astype(str): un nombre vacío queda en -1 y no como el texto 'nan'
+    codigos_nombre, nombres_unicos = pd.factorize(df[columna_nombre])
+    # Un id por nombre normalizado, en orden alfabético: un prefijo es un rango de ids
+    codigos_normalizado, normalizados = pd.factorize(
+        pd.Series([normalizar_nombre(n) for n in nombres_unicos], dtype=object), sort=True)
+    con_nombre = np.flatnonzero(codigos_nombre >= 0)
+    codigos_nombre = codigos_normalizado[codigos_nombre[con_nombre]]
+    normalizados = np.array(normalizados, dtype=str)
+    n_nombres = len(normalizados)
+
+    # Filas de cada nombre (CSR, en orden de aparición)
+    filas_nombre = con_nombre[np.argsort(codigos_nombre, kind='stable')]
+    inicio_filas = np.searchsorted(np.sort(codigos_nombre), np.arange(n_nombres + 1))
+
+    # Palabras ordenadas con el nombre al que pertenecen; cada palabra distinta es
+    # un tramo contiguo [inicio_palabras[p], inicio_palabras[p + 1])
+    palabras = [n.split() for n in normalizados]
+    duenos = np.repeat(np.arange(n_nombres), [len(p) for p in palabras])
+    palabras = np.array([p for ps in palabras for p in ps], dtype=str)
+    orden = np.argsort(palabras, kind='stable')
+    palabras, duenos = palabras[orden], duenos[orden]
+    distintas, inicio_palabras = np.unique(palabras, return_index=True)
+    n_palabras = len(distintas)
+
+    # Listas de palabras distintas por trigrama (CSR), sin repetir (palabra, trigrama)
+    palabra_tri, codigo_tri = trigramas(distintas)
+    tri, vocabulario = pd.factorize(codigo_tri, sort=True)
+    pares = np.sort(pd.unique(tri.astype(np.int64) * max(n_palabras, 1) + palabra_tri))
+    tri, palabra_tri = np.divmod(pares, max(n_palabras, 1))
+
+    codigos_carrera, carreras_unicas = pd.factorize(df[columna_carrera])
+    return {
+        'normalizados': normalizados,
+        'filas_nombre': filas_nombre,
+        'inicio_filas': inicio_filas,
+        'palabras': palabras,
+        'duenos': duenos,
+        'inicio_palabras': np.r_[inicio_palabras, len(palabras)],
+        'vocabulario': vocabulario,
+        'inicio_trigramas': np.searchsorted(tri, np.arange(len(vocabulario) + 1)),
+        'palabras_trigrama': palabra_tri,
+        'codigos_carrera': codigos_carrera,
+        'carreras': pd.Index([str(c) for c in carreras_unicas])
+    }
+
+def _rango_prefijo(ordenadas: np.ndarray, prefijo: str):
+    """[desde, hasta) de los textos de `ordenadas` que empiezan con `prefijo`."""
+    ancho = ordenadas.dtype.itemsize // 4
+    if len(prefijo) > ancho:    # más largo que cualquier texto: sin coincidencias
+        return 0, 0
+    # Claves del mismo ancho que el arreglo: searchsorted no convierte el arreglo completo
+    clave = np.array(prefijo, dtype=ordenadas.dtype)
+    if len(prefijo) == ancho:   # sólo coincide el texto idéntico
+        return int(np.searchsorted(ordenadas, clave, 'left')), int(np.searchsorted(ordenadas, clave, 'right'))
+    fin = np.array(prefijo + FIN_PREFIJO, dtype=ordenadas.dtype)
+    return int(np.searchsorted(ordenadas, clave, 'left')), int(np.searchsorted(ordenadas, fin, 'left'))
+
+def _filas_de_nombres(indice: dict, nombres: np.ndarray, k: int, carrera) -> np.ndarray:
+    """
+    Hasta k filas de `nombres` (ids, en ese orden) de la carrera indicada (código o
+    None). Se expanden por tramos crecientes: sólo se tocan las filas necesarias.
+    """
+    inicio_filas, resultado = indice['inicio_filas'], [np.array([], dtype=np.intp)]
+    encontradas, hecho, tramo = 0, 0, max(k, 64)
+    while encontradas < k and hecho < len(nombres):
+        bloque = nombres[hecho:hecho + tramo]
+        hecho, tramo = hecho + tramo, tramo * 4
+        desde = inicio_filas[bloque]
+        cuantas = inicio_filas[bloque + 1] - desde
+        salto = np.repeat(desde - np.cumsum(np.r_[0, cuantas[:-1]]), cuantas)
+        filas = indice['filas_nombre'][salto + np.arange(cuantas.sum())]
+        if carrera is not None:
+            filas = filas[indice['codigos_carrera'][filas] == carrera]
+        resultado.append(filas)
+        encontradas += len(filas)
+    return np.concatenate(resultado)[:k]
+
+def _parecido_por_nombre(indice: dict, palabra: str) -> np.ndarray:
+    """
+    Para cada id de nombre, el mayor parecido entre una palabra de la consulta y las
+    palabras del nombre: la fracción de los trigramas de la consulta que están en la
+    palabra (1 si es prefijo), o 0 si ninguna llega a UMBRAL_TRIGRAMAS. La consulta
+    puede estar a medio escribir: no se usa su trigrama de cierre.
+    """
+    _, codigos = trigramas(np.array([palabra]))
+    codigos = np.unique(codigos[:-1] if len(codigos) > 1 else codigos)
+    vocabulario, inicio_tri = indice['vocabulario'], indice['inicio_trigramas']
+    posiciones = np.minimum(np.searchsorted(vocabulario, codigos), max(len(vocabulario) - 1, 0))
+    presentes = posiciones[vocabulario[posiciones] == codigos] if len(vocabulario) else posiciones[:0]
+    listas = [indice['palabras_trigrama'][inicio_tri[t]:inicio_tri[t + 1]] for t in presentes]
+    inicio_palabras = indice['inicio_palabras']
+    comunes = np.bincount(np.concatenate(listas or [np.array([], dtype=np.int64)]),
+                          minlength=len(inicio_palabras) - 1)
+
+    # De palabras distintas a sus apariciones (tramos de 'duenos')
+    parecidas = np.flatnonzero(comunes >= UMBRAL_TRIGRAMAS * len(codigos))
+    desde = inicio_palabras[parecidas]
+    cuantas = inicio_palabras[parecidas + 1] - desde
+    salto = np.repeat(desde - np.cumsum(np.r_[0, cuantas[:-1]]), cuantas)
+    parecido = np.zeros(len(indice['normalizados']))
+    np.maximum.at(parecido, indice['duenos'][salto + np.arange(cuantas.sum())],
+                  np.repeat(comunes[parecidas] / len(codigos), cuantas))
+    desde, hasta = _rango_prefijo(indice['palabras'], palabra)
+    parecido[indice['duenos'][desde:hasta]] = 1.0
+    return parecido
+
+def buscar_estudiantes(indice: dict, texto: str, k: int = 10, carrera=None) -> list:
+    """
+    Posiciones de fila de hasta k estudiantes cuyo nombre coincide con `texto`,
+    opcionalmente sólo de `carrera`. Primero los nombres que empiezan con la
+    consulta, luego aquellos donde cada palabra de la consulta es prefijo de una
+    palabra del nombre (ambos grupos en orden alfabético) y, si faltan, aquellos
+    donde cada palabra de la consulta se parece a una del nombre por trigramas
+    (de más a menos parecido): así 'garcai' encuentra 'García'.
+    """
+    consulta = normalizar_nombre(texto)
+    if not consulta or k <= 0:
+        return []
+    if carrera is not None:
+        carrera = indice['carreras'].get_indexer([str(carrera)])[0]
+        if carrera < 0:
+            return []
+    n_nombres = len(indice['normalizados'])
+
+    # 1) El nombre completo empieza con la consulta: un rango de ids
+    inicio, fin = _rango_prefijo(indice['normalizados'], consulta)
+    elegidos = np.zeros(n_nombres, dtype=bool)
+    elegidos[inicio:fin] = True
+    filas = [_filas_de_nombres(indice, np.arange(inicio, fin), k, carrera)]
+
+    # 2) Cada palabra de la consulta es prefijo de alguna palabra del nombre
+    if len(filas[0]) < k:
+        prefijo = np.ones(n_nombres, dtype=bool)
+        for palabra in consulta.split():
+            desde, hasta = _rango_prefijo(indice['palabras'], palabra)
+            coincide = np.zeros(n_nombres, dtype=bool)
+            coincide[indice['duenos'][desde:hasta]] = True
+            prefijo &= coincide
+        prefijo &= ~elegidos
+        elegidos |= prefijo
+        filas.append(_filas_de_nombres(indice, np.flatnonzero(prefijo), k - len(filas[0]), carrera))
+
+    # 3) Parecidos palabra a palabra, sólo si los prefijos no alcanzan: cada palabra
+    #    de la consulta debe parecerse a alguna del nombre; se ordena por la suma
+    faltan = k - sum(len(f) for f in filas)
+    if faltan > 0:
+        similitud = np.zeros(n_nombres)
+        parecidos = ~elegidos
+        for palabra in consulta.split():
+            parecido = _parecido_por_nombre(indice, palabra)
+            parecidos &= parecido > 0
+            similitud += parecido
+        ids = np.flatnonzero(parecidos)
+        filas.append(_filas_de_nombres(indice, ids[np.argsort(-similitud[ids], kind='stable')], faltan, carrera))
+    return np.concatenate(filas).tolist()
+
+# ============================================
+# 11) PROCESAMIENTO POR LOTES (CLI)
+# ============================================
+def _puntuar_bloque(bloque: pd.DataFrame):
+    """Parte por fila del análisis (puntajes + destino) para un bloque del CSV."""
+    df, _, respuestas_no_reconocidas, _ = puntuar_respuestas(bloque)
+    df['Destino_Compatible'] = calcular_destino_compatible(df)
+    return df, respuestas_no_reconocidas
+
+def analizar_por_bloques(bloques, procesos: int = 1):
+    """
+    Analiza una cohorte leída por bloques (p. ej. pd.read_csv(..., chunksize=...)).
+    Los puntajes y el destino se calculan por bloque, en paralelo si procesos > 1;
+    el umbral intrapersonal, el semáforo y la intensidad se fijan después sobre
+    la cohorte completa. Devuelve (df con Nivel_Intensidad, respuestas no reconocidas).
+    """
+    if procesos > 1:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(procesos) as pool:
+            resultados = list(pool.map(_puntuar_bloque, bloques))
+    else:
+        resultados = [_puntuar_bloque(b) for b in bloques]
+
+    if not resultados:
+        raise ValueError("El archivo no contiene filas.")
+
+    df = pd.concat([r[0] for r in resultados])
+    respuestas_no_reconocidas = {}
+    for r in resultados:
+        for token, n in r[1].items():
+            respuestas_no_reconocidas[token] = respuestas_no_reconocidas.get(token, 0) + n
+
+    clasificar_respuestas(df, calcular_umbral_intrapersonal(df['Desv_Intrapersona']))
+    df['Destino_Compatible'] = df.pop('Destino_Compatible')  # mismo orden de columnas que iniciar_estado
+    df['Nivel_Intensidad'] = calcular_intensidad(df)
+    compactar_tipos(df)
+    return df, respuestas_no_reconocidas
+
+def conclusiones_cohorte(df: pd.DataFrame) -> np.ndarray:
+    """
+    Conclusión de cada fila de un df que ya trae Destino_Compatible y Nivel_Intensidad.
+    Cada fila toma su plantilla de indice_plantillas y el texto se arma una sola vez
+    por combinación (plantilla, carrera, destino).
+    """
+    if df.empty:
+        return np.array([], dtype=object)
+    # Carrera y destino como códigos (con columnas Categorical, los de la propia columna)
+    codigo_carrera, carreras = pd.factorize(df[columna_carrera], use_na_sentinel=False)
+    codigo_destino, destinos = pd.factorize(df['Destino_Compatible'], use_na_sentinel=False)
+    carreras = np.array([str(c) for c in carreras], dtype=object)
+    destinos = np.asarray(destinos, dtype=object)
+    carrera, destino = carreras[codigo_carrera], destinos[codigo_destino]
+
+    nivel_idx = pd.Index(niveles_conclusion).get_indexer(df['Nivel_Intensidad'])
+    categoria = np.where(
+        df['Respondio_Siempre_Igual'].to_numpy(dtype=bool),
+        'Respondió siempre igual',
+        df['Semáforo Vocacional'].to_numpy(dtype=object)
+    )
+    categoria_idx = pd.Index(semaforos_conclusion).get_indexer(categoria)
+    plantilla_idx = indice_plantillas[
+        np.where(nivel_idx < 0, len(niveles_conclusion), nivel_idx),
+        np.where(categoria_idx < 0, len(semaforos_conclusion), categoria_idx),
+        (destino != carrera).astype(np.intp)
+    ]
+
+    clave = (plantilla_idx * len(carreras) + codigo_carrera) * len(destinos) + codigo_destino
+    codigos, claves_unicas = pd.factorize(clave)
+    plantilla_u, resto = np.divmod(claves_unicas, len(carreras) * len(destinos))
+    carrera_u, destino_u = np.divmod(resto, len(destinos))
+    textos = np.array([
+        plantillas_conclusion[p].format(carrera=carreras[c], destino=destinos[d])
+        for p, c, d in zip(plantilla_u, carrera_u, destino_u)
+    ], dtype=object)
+    return textos[codigos]
+
+def tabla_enriquecida(df: pd.DataFrame, con_conclusion: bool = True) -> pd.DataFrame:
+    """df analizado con la conclusión opcional como última columna."""
+    salida = df.copy()
+    if con_conclusion:
+        salida['Conclusion_Recomendacion'] = conclusiones_cohorte(salida)
+    return salida
+
+def tabla_conclusiones(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Una fila por estudiante con semáforo, nivel de intensidad, destino compatible y
+    conclusión, a partir de un análisis ya hecho (no vuelve a puntuar ni clasificar).
+    """
+    columnas = (
+        [columna_nombre, columna_carrera]
+        + ([columna_fuente] if columna_fuente in df.columns else [])
+        + ['Semáforo Vocacional', 'Respondio_Siempre_Igual', 'Nivel_Intensidad', 'Destino_Compatible']
+    )
+    salida = df[columnas].copy()
+    salida['Conclusion_Recomendacion'] = conclusiones_cohorte(salida)
+    return salida.drop(columns='Respondio_Siempre_Igual')
+
+# Una hoja de Excel tiene 1,048,576 filas, una de ellas el encabezado
+FILAS_MAX_EXCEL = 1_048_575
+
+def validar_filas_excel(df: pd.DataFrame) -> None:
+    if len(df) > FILAS_MAX_EXCEL:
+        raise ValueError(
+            f"Excel admite hasta {FILAS_MAX_EXCEL:,} filas por hoja y la tabla tiene "
+            f"{len(df):,}; use CSV o Parquet."
+        )
+
+def archivo_tabla(df: pd.DataFrame, formato: str, bloque: int = 50000) -> bytes:
+    """CSV (UTF-8 con BOM, escrito por bloques) o Excel (.xlsx, requiere openpyxl) en memoria."""
+    buffer = io.BytesIO()
+    if formato == "xlsx":
+        validar_filas_excel(df)
+        df.to_excel(buffer, index=False, engine="openpyxl")
+    else:
+        df.to_csv(buffer, index=False, encoding="utf-8-sig", chunksize=bloque)
+    return buffer.getvalue()
+
+def escribir_tabla(df: pd.DataFrame, salida: str) -> None:
+    if salida.lower().endswith(".parquet"):
+        df.to_parquet(salida, index=False)
+    elif salida.lower().endswith(".xlsx"):
+        validar_filas_excel(df)
+        df.to_excel(salida, index=False, engine="openpyxl")
+    else:
+        df.to_csv(salida, index=False)
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Analiza una cohorte CHASIDE sin interfaz y escribe la tabla enriquecida."
+    )
+    parser.add_argument("entrada", help="CSV exportado del formulario (ruta, file:// o URL)")
+    parser.add_argument("salida", help="Archivo de salida (.parquet, .xlsx o .csv)")
+    parser.add_argument("--bloque", type=int, default=50000, help="Filas por bloque (default: 50000)")
+    parser.add_argument("--procesos", type=int, default=1, help="Procesos en paralelo (default: 1)")
+    parser.add_argument("--sin-conclusion", action="store_true", help="No generar el texto de conclusión")
+    args = parser.parse_args(argv)
+
+    lector = pd.read_csv(args.entrada, chunksize=args.bloque, **OPCIONES_CSV)
+    primero = next(lector, None)
+    if primero is None:
+        print("El archivo no contiene filas.", file=sys.stderr)
+        return 1
+    faltantes = columnas_faltantes(primero)
+    if faltantes:
+        print(f"Faltan columnas requeridas: {faltantes}", file=sys.stderr)
+        return 1
+
+    df, respuestas_no_reconocidas = analizar_por_bloques(
+        itertools.chain([primero], lector),
+        procesos=args.procesos
+    )
+    if respuestas_no_reconocidas:
+        print(f"Respuestas no reconocidas (contadas como 0): {respuestas_no_reconocidas}", file=sys.stderr)
+
+    try:
+        escribir_tabla(tabla_enriquecida(df, con_conclusion=not args.sin_conclusion), args.salida)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 1
+    print(f"{len(df)} estudiantes procesados → {args.salida}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,19 +1,54 @@
 # ============================================
 # MÓDULO 3 · INFORMACIÓN PARTICULAR DEL ESTUDIANTADO
 # Versión depurada: URL + selección + ubicación + conclusión + PDF
+# El análisis vive en chaside.py; este archivo es sólo la interfaz Streamlit.
 # ============================================
 
-import io
+import os
+import functools
+import tempfile
+import uuid
+import threading
 import streamlit as st
-import pandas as pd
 import numpy as np
+import pandas as pd
 
-from reportlab.lib import colors
-from reportlab.lib.pagesizes import letter
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.enums import TA_LEFT
-from reportlab.lib.units import cm
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
+from chaside import (
+    leer_fuente,
+    interpretar_fuentes,
+    leer_fuentes,
+    combinar_fuentes,
+    columna_fuente,
+    columna_carrera,
+    columna_nombre,
+    columnas_faltantes,
+    huella_configuracion,
+    resumen_cubo,
+    panorama_cubo,
+    iniciar_estado,
+    actualizar_estado,
+    descripcion_intensidad,
+    construir_conclusion_recomendacion,
+    cat_map_largo,
+    texto_ubicacion_reporte,
+    nombre_archivo_pdf,
+    tareas_reportes,
+    tabla_conclusiones,
+    archivo_tabla,
+    FILAS_MAX_EXCEL,
+    memoria_por_columna,
+    interpretar_pesos,
+    interpretar_perfiles,
+    evaluar_sensibilidad,
+    transiciones_sensibilidad,
+    construir_indice_similitud,
+    estudiantes_similares,
+    tabla_similares,
+    construir_indice_nombres,
+    buscar_estudiantes
+)
+from perfilado import iniciar_registro, etapa, sin_panel
+from almacen import estado_persistente
 
 # -----------------------------------
 # CONFIG STREAMLIT
@@ -25,6 +60,35 @@ st.caption(
     "la recomendación individual y descargar el reporte en PDF."
 )
 
+# -----------------------------------
+# PERFILADO POR ETAPAS (OPCIONAL)
+# -----------------------------------
+# Activado: tabla de tiempos de esta ejecución en la barra lateral y una línea
+# JSON por etapa en el logger "chaside.perfilado" (stderr o CHASIDE_PERFILADO_LOG).
+perfilado_activo = st.sidebar.toggle(
+    "⏱️ Perfilado por etapas",
+    value=os.environ.get("CHASIDE_PERFILADO", "") == "1"
+)
+panel_perfilado = None
+if perfilado_activo:
+    st.session_state.setdefault('id_sesion', uuid.uuid4().hex[:12])
+    st.session_state['ejecucion'] = st.session_state.get('ejecucion', 0) + 1
+    panel_perfilado = st.sidebar.expander("Tiempos de esta ejecución", expanded=True).empty()
+
+def mostrar_perfilado(etapas: list) -> None:
+    panel_perfilado.dataframe(
+        pd.DataFrame(etapas, columns=['etapa', 'segundos', 'filas', 'memoria_delta_mb']),
+        hide_index=True,
+        use_container_width=True
+    )
+
+registro = iniciar_registro(
+    perfilado_activo,
+    al_registrar=mostrar_perfilado,
+    sesion=st.session_state.get('id_sesion'),
+    ejecucion=st.session_state.get('ejecucion')
+)
+
 # ============================================
 # 1) CARGA DE DATOS
 # ============================================
@@ -33,403 +97,341 @@ url = st.text_input(
     "https://docs.google.com/spreadsheets/d/1BNAeOSj2F378vcJE5-T8iJ8hvoseOleOHr-I7mVfYu4/export?format=csv"
 )
 
-@st.cache_data(show_spinner=False)
-def load_data(u: str) -> pd.DataFrame:
-    return pd.read_csv(u)
-
-try:
-    df = load_data(url)
-except Exception as e:
-    st.error(f"❌ No fue posible cargar el archivo: {e}")
+with st.expander("➕ Fuentes adicionales (otros planteles o periodos de admisión)"):
+    texto_fuentes = st.text_area(
+        "Una URL o ruta por línea, opcionalmente como «etiqueta | URL». "
+        "Se analizan junto con la URL principal como una sola cohorte.",
+        ""
+    )
+fuentes = interpretar_fuentes(f"{url}\n{texto_fuentes}")
+
+# cache_resource: el DataFrame se comparte sin copiarse en cada rerun; no debe mutarse.
+@st.cache_resource(show_spinner=False)
+def load_data(u: str):
+    return leer_fuente(u)
+
+# La unión de varias fuentes se memoiza por sus huellas; cada fuente se lee (y queda
+# en caché) por separado, así que una fuente que falla se reintenta en el siguiente rerun.
+@st.cache_resource(show_spinner=False, max_entries=4)
+def combinar_cohorte(huellas: tuple, _cargadas: list):
+    return combinar_fuentes(_cargadas)
+
+def cargar_cohorte(cargar):
+    """(df_raw, huella, errores por fuente) de la única fuente o de todas las fuentes."""
+    if len(fuentes) == 1:
+        df, huella = cargar(fuentes[0][1])
+        return df, huella, {}
+    cargadas, errores = leer_fuentes(fuentes, cargar=cargar)
+    if not cargadas:
+        raise ValueError("ninguna de las fuentes pudo cargarse")
+    df, huella = combinar_cohorte(tuple((e, h) for e, _, h in cargadas), cargadas)
+    return df, huella, errores
+
+if not fuentes:
+    st.warning("Ingrese la URL de la hoja o al menos una fuente adicional.")
     st.stop()
 
+with etapa(registro, "1) carga") as medicion:
+    try:
+        df_raw, huella_datos, errores_fuentes = cargar_cohorte(load_data)
+    except Exception as e:
+        st.error(f"❌ No fue posible cargar el archivo: {e}")
+        st.stop()
+    for etiqueta, error in errores_fuentes.items():
+        st.warning(f"⚠️ No fue posible cargar «{etiqueta}»; se omite del análisis: {error}")
+    medicion['filas'] = len(df_raw)
+
+    faltantes = columnas_faltantes(df_raw)
+    if faltantes:
+        st.error(f"❌ Faltan columnas requeridas: {faltantes}")
+        st.stop()
+
 # ============================================
-# 2) PREPROCESAMIENTO CHASIDE
+# 2) ANÁLISIS COMPLETO E INGESTA INCREMENTAL
 # ============================================
-columnas_items = df.columns[5:103]
-columna_carrera = '¿A qué carrera desea ingresar?'
-columna_nombre  = 'Ingrese su nombre completo'
+# cache_resource comparte el resultado entre reruns y sesiones sin copiarlo;
+# las secciones siguientes sólo leen df. Con CHASIDE_ALMACEN_DIR el análisis se
+# guarda en disco y otras réplicas (o este proceso tras reiniciar) lo leen de ahí.
+@st.cache_resource(show_spinner="Procesando resultados CHASIDE…", max_entries=8)
+def analizar_cohorte(_df_raw: pd.DataFrame, huella_datos: str, huella_config: str, fuente: str, _registro=None) -> dict:
+    with etapa(_registro, "almacén", len(_df_raw)) as medicion:
+        estado, medicion['origen'] = estado_persistente(
+            huella_datos, huella_config, lambda: iniciar_estado(_df_raw, _registro),
+            fuente=fuente
+        )
+    return estado
 
-faltantes = [c for c in [columna_carrera, columna_nombre] if c not in df.columns]
-if faltantes:
-    st.error(f"❌ Faltan columnas requeridas: {faltantes}")
-    st.stop()
+@st.cache_resource(show_spinner=False)
+def contenedor_incremental(fuentes: tuple, huella_config: str) -> dict:
+    return {'estado': None, 'lock': threading.Lock()}
 
-# Sí/No → 1/0
-df_items = (
-    df[columnas_items]
-      .astype(str)
-      .apply(lambda col: col.str.strip().str.lower())
-      .replace({
-          'sí': 1, 'si': 1, 's': 1, '1': 1, 'true': 1, 'verdadero': 1, 'x': 1,
-          'no': 0, 'n': 0, '0': 0, 'false': 0, 'falso': 0, '': 0, 'nan': 0
-      })
-      .apply(pd.to_numeric, errors='coerce')
-      .fillna(0)
-      .astype(int)
+modo_incremental = st.toggle(
+    "Ingesta incremental (procesar sólo las respuestas nuevas de la hoja)",
+    value=False
 )
-df[columnas_items] = df_items
-
-# Desviación intrapersona
-df['Desv_Intrapersona'] = df[columnas_items].std(axis=1)
-umbral_intrapersonal = df['Desv_Intrapersona'].quantile(0.10)
-df['Respondio_Siempre_Igual'] = df['Desv_Intrapersona'] <= umbral_intrapersonal
-
-# Mapeo CHASIDE
-areas = ['C','H','A','S','I','D','E']
-
-intereses_items = {
-    'C':[1,12,20,53,64,71,78,85,91,98],
-    'H':[9,25,34,41,56,67,74,80,89,95],
-    'A':[3,11,21,28,36,45,50,57,81,96],
-    'S':[8,16,23,33,44,52,62,70,87,92],
-    'I':[6,19,27,38,47,54,60,75,83,97],
-    'D':[5,14,24,31,37,48,58,65,73,84],
-    'E':[17,32,35,42,49,61,68,77,88,93]
-}
-
-aptitudes_items = {
-    'C':[2,15,46,51],
-    'H':[30,63,72,86],
-    'A':[22,39,76,82],
-    'S':[4,29,40,69],
-    'I':[10,26,59,90],
-    'D':[13,18,43,66],
-    'E':[7,55,79,94]
-}
-
-def col_item(i: int) -> str:
-    return columnas_items[i - 1]
-
-for a in areas:
-    df[f'INTERES_{a}'] = df[[col_item(i) for i in intereses_items[a]]].sum(axis=1)
-    df[f'APTITUD_{a}'] = df[[col_item(i) for i in aptitudes_items[a]]].sum(axis=1)
-
-peso_intereses, peso_aptitudes = 0.8, 0.2
-for a in areas:
-    df[f'PUNTAJE_COMBINADO_{a}'] = (
-        df[f'INTERES_{a}'] * peso_intereses +
-        df[f'APTITUD_{a}'] * peso_aptitudes
-    )
-    df[f'TOTAL_{a}'] = df[f'INTERES_{a}'] + df[f'APTITUD_{a}']
 
-df['Area_Fuerte_Ponderada'] = df.apply(
-    lambda r: max(areas, key=lambda a: r[f'PUNTAJE_COMBINADO_{a}']),
-    axis=1
+buscar_nuevas = st.button("🔄 Buscar respuestas nuevas") if modo_incremental else False
+
+# Con el análisis en caché las subetapas (preprocesamiento, destino, intensidad)
+# sólo aparecen en la ejecución que lo calcula. Dentro de funciones en caché no se
+# escribe en el panel (Streamlit no puede reproducir elementos de bloques externos).
+# Identifica la hoja en el almacén: sus entradas antiguas se borran al guardar una nueva
+fuente_cohorte = "\n".join(u for _, u in fuentes)
+
+with etapa(registro, "2) análisis") as medicion:
+    if modo_incremental:
+        contenedor = contenedor_incremental(tuple(fuentes), huella_configuracion())
+        with contenedor['lock']:
+            if contenedor['estado'] is None:
+                contenedor['estado'] = analizar_cohorte(df_raw, huella_datos, huella_configuracion(), fuente_cohorte, sin_panel(registro))
+            if buscar_nuevas:
+                try:
+                    previas = contenedor['estado']['filas_procesadas']
+                    contenedor['estado'] = actualizar_estado(contenedor['estado'], cargar_cohorte(leer_fuente)[0], registro)
+                    st.success(
+                        f"✅ Se incorporaron {contenedor['estado']['filas_procesadas'] - previas} respuestas nuevas."
+                    )
+                except Exception as e:
+                    st.error(f"❌ No fue posible actualizar el archivo: {e}")
+            estado = contenedor['estado']
+    else:
+        estado = analizar_cohorte(df_raw, huella_datos, huella_configuracion(), fuente_cohorte, sin_panel(registro))
+    medicion['filas'] = estado['filas_procesadas']
+
+df = estado['df']
+cubo = estado['cubo']
+respuestas_no_reconocidas = estado['respuestas_no_reconocidas']
+
+# Identifica la versión del análisis (datos + configuración + marca incremental)
+version_analisis = (
+    f"{huella_datos}:{huella_configuracion()}:"
+    f"{estado['filas_procesadas']}:{estado['huella_ultima_fila']}"
 )
 
-score_cols = [f'PUNTAJE_COMBINADO_{a}' for a in areas]
-df['Score'] = df[score_cols].max(axis=1)
-
-# Perfiles de carrera
-perfil_carreras = {
-    'Arquitectura': {'Fuerte': ['A','I','C']},
-    'Contador Público': {'Fuerte': ['C','D']},
-    'Licenciatura en Administración': {'Fuerte': ['C','D']},
-    'Ingeniería Ambiental': {'Fuerte': ['I','C','E']},
-    'Ingeniería Bioquímica': {'Fuerte': ['I','C','E']},
-    'Ingeniería en Gestión Empresarial': {'Fuerte': ['C','D','H']},
-    'Ingeniería Industrial': {'Fuerte': ['C','D','H']},
-    'Ingeniería en Inteligencia Artificial': {'Fuerte': ['I','E']},
-    'Ingeniería Mecatrónica': {'Fuerte': ['I','E']},
-    'Ingeniería en Sistemas Computacionales': {'Fuerte': ['I','E']}
-}
-
-def evaluar(area_chaside, carrera):
-    p = perfil_carreras.get(str(carrera).strip())
-    if not p:
-        return 'Sin perfil definido'
-    if area_chaside in p.get('Fuerte', []):
-        return 'Coherente'
-    if area_chaside in p.get('Baja', []):
-        return 'Requiere Orientación'
-    return 'Neutral'
-
-df['Coincidencia_Ponderada'] = df.apply(
-    lambda r: evaluar(r['Area_Fuerte_Ponderada'], r[columna_carrera]),
-    axis=1
-)
+# Con el perfilado activo, la barra lateral muestra cuánta memoria ocupa el df en
+# caché: es lo que cada análisis retenido suma al proceso del servidor.
+@st.cache_data(show_spinner=False, max_entries=4)
+def reporte_memoria(version_analisis: str, _df: pd.DataFrame) -> pd.DataFrame:
+    return memoria_por_columna(_df)
+
+if perfilado_activo:
+    memoria = reporte_memoria(version_analisis, df)
+    with st.sidebar.expander("Memoria del análisis"):
+        st.caption(
+            f"{memoria['Bytes'].sum() / 2**20:,.1f} MB en total · "
+            f"{memoria['Bytes por estudiante'].sum():,.0f} bytes por estudiante"
+        )
+        st.dataframe(memoria, hide_index=True, use_container_width=True)
 
-def carrera_mejor(r):
-    if r['Respondio_Siempre_Igual']:
-        return 'Información no confiable'
-    a = r['Area_Fuerte_Ponderada']
-    c_actual = str(r[columna_carrera]).strip()
-    sugeridas = [c for c, p in perfil_carreras.items() if a in p.get('Fuerte', [])]
-    return c_actual if c_actual in sugeridas else (', '.join(sugeridas) if sugeridas else 'Sin sugerencia clara')
-
-def diagnostico(r):
-    if r['Carrera_Mejor_Perfilada'] == 'Información no confiable':
-        return 'Información no confiable'
-    if str(r[columna_carrera]).strip() == str(r['Carrera_Mejor_Perfilada']).strip():
-        return 'Perfil adecuado'
-    if r['Carrera_Mejor_Perfilada'] == 'Sin sugerencia clara':
-        return 'Sin sugerencia clara'
-    return f"Sugerencia: {r['Carrera_Mejor_Perfilada']}"
-
-def semaforo(r):
-    diag = r['Diagnóstico Primario Vocacional']
-    if diag == 'Información no confiable':
-        return 'Respondió siempre igual'
-    if diag == 'Sin sugerencia clara':
-        return 'Sin sugerencia'
-    match = r['Coincidencia_Ponderada']
-    if diag == 'Perfil adecuado':
-        return {'Coherente':'Verde','Neutral':'Amarillo','Requiere Orientación':'Rojo'}.get(match, 'Sin sugerencia')
-    if isinstance(diag, str) and diag.startswith('Sugerencia:'):
-        return {'Coherente':'Verde','Neutral':'Amarillo','Requiere Orientación':'Rojo'}.get(match, 'Sin sugerencia')
-    return 'Sin sugerencia'
-
-df['Carrera_Mejor_Perfilada'] = df.apply(carrera_mejor, axis=1)
-df['Diagnóstico Primario Vocacional'] = df.apply(diagnostico, axis=1)
-df['Semáforo Vocacional'] = df.apply(semaforo, axis=1)
-
-df['Carrera_Corta'] = (
-    df[columna_carrera]
-    .astype(str)
-    .str.replace('Ingeniería', 'Ing.', regex=False)
-)
+if respuestas_no_reconocidas:
+    detalle = ", ".join(
+        f"'{t}' ({n})" for t, n in
+        sorted(respuestas_no_reconocidas.items(), key=lambda x: -x[1])[:10]
+    )
+    st.warning(f"⚠️ Se encontraron respuestas no reconocidas que se contaron como 0: {detalle}")
 
 # ============================================
-# 3) INTENSIDAD VOCACIONAL
+# 3) PANORAMA DE LA COHORTE
 # ============================================
-df_intensidad = df[df['Semáforo Vocacional'].isin(['Verde', 'Amarillo'])].copy()
-
-def asignar_niveles_por_carrera(grupo):
-    grupo = grupo.copy()
-    grupo['Nivel_Intensidad'] = np.nan
-
-    amar = grupo[grupo['Semáforo Vocacional'] == 'Amarillo'].copy()
-    ver = grupo[grupo['Semáforo Vocacional'] == 'Verde'].copy()
-
-    if len(amar) > 0:
-        amar = amar.sort_values('Score', ascending=True).copy()
-        amar['rank_pct'] = (np.arange(len(amar)) + 1) / len(amar)
-        amar['Nivel_Intensidad'] = np.where(
-            amar['rank_pct'] <= 0.25,
-            'Sin perfil',
-            'Perfil en riesgo'
-        )
-        grupo.loc[amar.index, 'Nivel_Intensidad'] = amar['Nivel_Intensidad']
-
-    if len(ver) > 0:
-        ver = ver.sort_values('Score', ascending=True).copy()
-        ver['rank_pct'] = (np.arange(len(ver)) + 1) / len(ver)
-        ver['Nivel_Intensidad'] = np.where(
-            ver['rank_pct'] > 0.75,
-            'Jóven promesa',
-            'Perfil en transición'
-        )
-        grupo.loc[ver.index, 'Nivel_Intensidad'] = ver['Nivel_Intensidad']
+# Todo sale del cubo de conteos (unas filas por carrera), calculado una vez por
+# versión del análisis y compartido entre sesiones: no recorre df.
+@st.cache_resource(show_spinner=False, max_entries=8)
+def resumen_cohorte(version_analisis: str, _cubo: pd.DataFrame) -> dict:
+    return {**resumen_cubo(_cubo), 'panorama': panorama_cubo(_cubo)}
+
+with etapa(registro, "3) panorama") as medicion:
+    resumen = resumen_cohorte(version_analisis, cubo)
+    panorama = resumen['panorama']
+    medicion['filas'] = len(cubo)
+
+    with st.expander("📊 Panorama de la cohorte"):
+        columnas_metricas = st.columns(len(panorama['conteo_semaforo']) + 1)
+        columnas_metricas[0].metric("Estudiantes", f"{panorama['n_total']:,}")
+        for columna, (categoria, n) in zip(columnas_metricas[1:], panorama['conteo_semaforo'].items()):
+            columna.metric(
+                categoria, f"{n:,}",
+                f"{n / panorama['n_total'] * 100:.1f}%" if panorama['n_total'] else None,
+                delta_color="off"
+            )
 
-    return grupo
+        st.markdown("**Semáforo vocacional por carrera**")
+        st.dataframe(panorama['semaforo_por_carrera'], use_container_width=True)
 
-if not df_intensidad.empty:
-    df_intensidad = (
-        df_intensidad
-        .groupby(columna_carrera, group_keys=False)
-        .apply(asignar_niveles_por_carrera)
-        .copy()
-    )
+        st.markdown("**Intensidad vocacional por carrera**")
+        st.dataframe(panorama['nivel_por_carrera'], use_container_width=True)
 
-descripcion_intensidad = {
-    "Sin perfil": "Estudiante cuya elección de carrera no muestra correspondencia con su perfil vocacional.",
-    "Perfil en riesgo": "Estudiante cuyo perfil vocacional presenta una coincidencia mínima con la carrera elegida.",
-    "Perfil en transición": "Estudiante cuya elección profesional y perfil vocacional presentan congruencia, aunque aún en proceso de consolidación.",
-    "Jóven promesa": "Estudiante con alta congruencia entre su perfil vocacional y la carrera elegida."
-}
+        st.markdown(
+            f"**Destino compatible distinto de la carrera elegida** "
+            f"({panorama['n_con_destino_distinto']:,} estudiantes; carrera elegida en filas, destino en columnas)"
+        )
+        if panorama['transiciones'].empty:
+            st.caption("Ningún estudiante tiene un destino compatible distinto de su carrera.")
+        else:
+            st.dataframe(panorama['transiciones'], use_container_width=True)
 
 # ============================================
-# 4) DESTINO VOCACIONAL COMPATIBLE
+# 4) SELECCIÓN CARRERA → ESTUDIANTE
 # ============================================
-def letras_carrera(carrera):
-    perfil = perfil_carreras.get(str(carrera).strip(), {})
-    return perfil.get('Fuerte', [])
-
-def puntaje_promedio_carrera(row, carrera):
-    letras = letras_carrera(carrera)
-    if not letras:
-        return np.nan
-    vals = [row[f'PUNTAJE_COMBINADO_{l}'] for l in letras]
-    return np.mean(vals)
-
-def carreras_compatibles(carrera_origen):
-    letras_origen = set(letras_carrera(carrera_origen))
-    compatibles = []
-
-    for carrera_destino in perfil_carreras.keys():
-        if carrera_destino == carrera_origen:
-            continue
-        letras_destino = set(letras_carrera(carrera_destino))
-        inter = letras_origen.intersection(letras_destino)
-        if len(inter) >= 2:
-            compatibles.append(carrera_destino)
-
-    return compatibles
-
-def mejor_destino_compatible(row, carrera_origen):
-    score_origen = puntaje_promedio_carrera(row, carrera_origen)
-    candidatas = carreras_compatibles(carrera_origen)
-
-    mejor_carrera = carrera_origen
-    mejor_score = score_origen
-
-    for c in candidatas:
-        score_c = puntaje_promedio_carrera(row, c)
-        if pd.notna(score_c) and score_c > mejor_score:
-            mejor_score = score_c
-            mejor_carrera = c
-
-    return mejor_carrera
-
-df['Destino_Compatible'] = df.apply(
-    lambda row: mejor_destino_compatible(row, str(row[columna_carrera]).strip()),
-    axis=1
-)
+st.markdown("### 🧭 Selección de carrera y estudiante")
 
-# ============================================
-# 5) CONCLUSIÓN Y RECOMENDACIÓN
-# ============================================
-def construir_conclusion_recomendacion(al, carrera_sel, destino_compatible, nivel_alumno):
-    categoria = al['Semáforo Vocacional']
-    respondio_igual = bool(al.get('Respondio_Siempre_Igual', False))
-
-    if respondio_igual or categoria == 'Respondió siempre igual':
-        return (
-            "El patrón de respuestas sugiere baja variabilidad, por lo que el perfil obtenido debe interpretarse con cautela. "
-            "Esto puede indicar que la prueba fue contestada con respuestas muy homogéneas o sin suficiente diferenciación entre intereses y aptitudes. "
-            "Se recomienda reaplicar la prueba en condiciones controladas, explicar nuevamente su propósito y posteriormente realizar una entrevista breve de orientación vocacional."
-        )
+def construir_indice_seleccion(df: pd.DataFrame) -> dict:
+    """
+    Índice carrera → estudiantes construido una vez por versión del análisis, en
+    arreglos: códigos de carrera y de nombre por fila y las filas ordenadas por
+    (carrera, nombre, aparición) con el inicio de cada carrera (CSR). Los nombres
+    repetidos dentro de una carrera se rotulan "Nombre (registro k de m)" para que
+    cada registro sea elegible; las etiquetas se arman sólo para las filas mostradas.
+    """
+    carreras = df[columna_carrera].astype(object)
+    codigos_carrera, carreras_unicas = pd.factorize(carreras.where(carreras.isna(), carreras.astype(str)), sort=True)
+    codigos_nombre, nombres_unicos = pd.factorize(df[columna_nombre].astype(str), sort=True)
+
+    # Filas con carrera, ordenadas por (carrera, nombre, aparición)
+    validas = np.flatnonzero(codigos_carrera >= 0)
+    filas = validas[np.lexsort((codigos_nombre[validas], codigos_carrera[validas]))]
+    inicio_carrera = np.searchsorted(codigos_carrera[filas], np.arange(len(carreras_unicas) + 1))
+
+    # k y m de cada fila dentro de su (carrera, nombre)
+    clave = codigos_carrera[filas].astype(np.int64) * max(len(nombres_unicos), 1) + codigos_nombre[filas]
+    nuevo_grupo = np.ones(len(filas), dtype=bool)
+    nuevo_grupo[1:] = clave[1:] != clave[:-1]
+    inicio_grupo = np.flatnonzero(nuevo_grupo)
+    grupo = np.cumsum(nuevo_grupo) - 1
+    registro_k = np.zeros(len(df), dtype=np.int32)
+    registro_m = np.zeros(len(df), dtype=np.int32)
+    registro_k[filas] = np.arange(len(filas)) - inicio_grupo[grupo] + 1
+    registro_m[filas] = np.diff(np.r_[inicio_grupo, len(filas)])[grupo]
+    return {
+        'carreras': [str(c) for c in carreras_unicas],
+        'codigos_carrera': codigos_carrera,
+        'codigos_nombre': codigos_nombre,
+        'nombres': nombres_unicos,
+        'filas': filas,
+        'inicio_carrera': inicio_carrera,
+        'registro_k': registro_k,
+        'registro_m': registro_m
+    }
+
+def carrera_de_fila(indice: dict, fila: int):
+    """Carrera de la fila, o None si no tiene (no es elegible)."""
+    codigo = indice['codigos_carrera'][fila]
+    return indice['carreras'][codigo] if codigo >= 0 else None
+
+def etiqueta_estudiante(indice: dict, fila: int) -> str:
+    nombre = indice['nombres'][indice['codigos_nombre'][fila]]
+    m = indice['registro_m'][fila]
+    return nombre if m == 1 else f"{nombre} (registro {indice['registro_k'][fila]} de {m})"
+
+@st.cache_resource(show_spinner=False, max_entries=8)
+def indice_seleccion(version_analisis: str, _df: pd.DataFrame) -> dict:
+    return construir_indice_seleccion(_df)
+
+# Búsqueda por nombre (sin acentos ni mayúsculas, por prefijo y aproximada):
+# el índice se arma una vez por versión y el selector recibe sólo las coincidencias.
+RESULTADOS_BUSQUEDA = 20
+LISTA_SIN_BUSQUEDA = 50
+
+@st.cache_resource(show_spinner=False, max_entries=8)
+def indice_nombres(version_analisis: str, _df: pd.DataFrame) -> dict:
+    return construir_indice_nombres(_df)
+
+with etapa(registro, "4) selección") as medicion:
+    indice = indice_seleccion(version_analisis, df)
+
+    carreras = indice['carreras']
+    if not carreras:
+        st.warning("No hay carreras disponibles en el archivo.")
+        st.stop()
+
+    carrera_sel = st.selectbox("Carrera a evaluar:", carreras, index=0)
+
+    columna_busqueda, columna_todas = st.columns([3, 1])
+    busqueda = columna_busqueda.text_input(
+        "Buscar estudiante por nombre:", placeholder="Escriba parte del nombre (sin importar acentos)"
+    )
+    en_todas = columna_todas.toggle("En todas las carreras", value=False)
 
-    if nivel_alumno == 'Sin perfil':
-        if destino_compatible != carrera_sel:
-            return (
-                f"El estudiante muestra una baja correspondencia entre su perfil vocacional y la carrera elegida, sin un ajuste claro dentro de {carrera_sel}. "
-                f"Además, el análisis de compatibilidad sugiere mayor afinidad hacia {destino_compatible}. "
-                f"Se recomienda repetir la prueba para confirmar estabilidad y, si el resultado persiste, canalizar a orientación vocacional para valorar un posible ingreso a una carrera más acorde con su perfil."
-            )
-        return (
-            f"El estudiante muestra una baja correspondencia entre su perfil vocacional y la carrera elegida, sin un ajuste claramente consolidado dentro de {carrera_sel}. "
-            f"Se recomienda repetir la prueba para confirmar el resultado y acompañar el proceso con orientación vocacional individual, antes de tomar decisiones académicas definitivas."
+    if busqueda.strip():
+        filas_encontradas = buscar_estudiantes(
+            indice_nombres(version_analisis, df), busqueda, RESULTADOS_BUSQUEDA,
+            carrera=None if en_todas else carrera_sel
         )
-
-    if nivel_alumno == 'Perfil en riesgo':
-        if destino_compatible != carrera_sel:
-            return (
-                f"El estudiante presenta una coincidencia mínima entre su perfil vocacional y la carrera elegida, lo que puede traducirse en dificultades posteriores de adaptación a asignaturas propias de la formación profesional. "
-                f"El análisis compatible sugiere mejor ajuste hacia {destino_compatible}. "
-                f"Se recomienda seguimiento tutorial temprano, orientación vocacional y valorar, de manera informada, una posible transición hacia una carrera más acorde con su perfil."
+        opciones_estudiante = {}
+        for fila in filas_encontradas:
+            carrera_fila = carrera_de_fila(indice, fila)
+            if carrera_fila is None:
+                continue
+            etiqueta = etiqueta_estudiante(indice, fila)
+            if carrera_fila != carrera_sel:
+                etiqueta = f"{etiqueta} · {carrera_fila}"
+            opciones_estudiante[etiqueta] = fila
+        if not opciones_estudiante:
+            st.warning(f"Ningún estudiante coincide con «{busqueda.strip()}».")
+            st.stop()
+    else:
+        codigo = carreras.index(carrera_sel)
+        filas_carrera = indice['filas'][indice['inicio_carrera'][codigo]:indice['inicio_carrera'][codigo + 1]]
+        if not len(filas_carrera):
+            st.warning("No hay estudiantes para esta carrera.")
+            st.stop()
+        opciones_estudiante = {
+            etiqueta_estudiante(indice, fila): int(fila) for fila in filas_carrera[:LISTA_SIN_BUSQUEDA]
+        }
+        if len(filas_carrera) > LISTA_SIN_BUSQUEDA:
+            st.caption(
+                f"Se muestran {LISTA_SIN_BUSQUEDA} de {len(filas_carrera)} estudiantes; "
+                "escriba parte del nombre para buscar."
             )
-        return (
-            f"El estudiante presenta una coincidencia mínima entre su perfil vocacional y la carrera elegida, por lo que existe riesgo de dificultades de adaptación académica, especialmente en asignaturas propias de la carrera. "
-            f"Se recomienda seguimiento tutorial, fortalecimiento de hábitos de estudio y una revisión vocacional complementaria durante el primer semestre."
-        )
 
-    if nivel_alumno == 'Perfil en transición':
-        if destino_compatible != carrera_sel:
-            return (
-                f"El estudiante muestra una congruencia vocacional funcional con la carrera elegida, aunque todavía en proceso de consolidación. "
-                f"Sin embargo, el análisis compatible también identifica afinidad con {destino_compatible}. "
-                f"Se recomienda mantener el acompañamiento académico y realizar una exploración vocacional complementaria, sin asumir de inmediato un cambio de carrera."
-            )
-        return (
-            f"El estudiante presenta una congruencia vocacional adecuada con la carrera elegida, aunque aún en consolidación. "
-            f"Se recomienda mantener un acompañamiento preventivo, reforzar hábitos académicos y dar seguimiento durante el primer semestre para favorecer la permanencia."
-        )
+    opcion_sel = st.selectbox("Estudiante:", list(opciones_estudiante), index=0)
 
-    if nivel_alumno == 'Jóven promesa':
-        if destino_compatible != carrera_sel:
-            return (
-                f"El estudiante presenta una alta congruencia entre su perfil vocacional y la carrera elegida, lo que favorece condiciones de buen ajuste académico. "
-                f"Aunque el análisis compatible detecta afinidad con {destino_compatible}, no se considera prioritario promover una transición, sino fortalecer su permanencia y potenciar su desarrollo dentro de la carrera actual."
-            )
-        return (
-            f"El estudiante presenta una alta congruencia entre su perfil vocacional y la carrera elegida, lo que sugiere condiciones favorables para un buen ajuste y permanencia académica. "
-            f"Se recomienda fortalecer su trayectoria, promover actividades de alto desempeño y considerar su incorporación a espacios de liderazgo, mentoría o desarrollo académico avanzado."
-        )
+    posicion_alumno = opciones_estudiante.get(opcion_sel)
+    if posicion_alumno is None:
+        st.warning("No se encontró el estudiante seleccionado.")
+        st.stop()
 
-    if categoria == 'Verde':
-        return (
-            "El perfil identificado coincide con la carrera elegida. Se recomienda mantener acompañamiento preventivo y reforzar estrategias de permanencia académica."
-        )
+    # Un resultado de otra carrera lleva el resto del reporte a esa carrera
+    if carrera_de_fila(indice, posicion_alumno) != carrera_sel:
+        carrera_sel = carrera_de_fila(indice, posicion_alumno)
+        st.caption(f"El estudiante pertenece a **{carrera_sel}**; el reporte usa esa carrera.")
 
-    if categoria == 'Amarillo':
-        return (
-            "El perfil identificado no coincide plenamente con la carrera elegida. Se recomienda orientación vocacional, seguimiento tutorial y revisión temprana de ajuste académico."
-        )
+    al = df.iloc[posicion_alumno]
+    indice_alumno = df.index[posicion_alumno]
+    est_sel = str(al[columna_nombre])
+    if columna_fuente in df.columns:
+        st.caption(f"Fuente / cohorte: {al[columna_fuente]}")
 
-    return (
-        "El resultado obtenido sugiere la necesidad de una interpretación complementaria mediante entrevista de orientación y seguimiento académico inicial."
-    )
+    nivel_alumno = al['Nivel_Intensidad']
+    medicion['filas'] = len(opciones_estudiante)
 
 # ============================================
-# 6) SELECCIÓN CARRERA → ESTUDIANTE
+# 5) UBICACIÓN DEL ESTUDIANTE DENTRO DEL ANÁLISIS GENERAL
 # ============================================
-st.markdown("### 🧭 Selección de carrera y estudiante")
-
-carreras = sorted(df[columna_carrera].dropna().astype(str).unique())
-if not carreras:
-    st.warning("No hay carreras disponibles en el archivo.")
-    st.stop()
-
-carrera_sel = st.selectbox("Carrera a evaluar:", carreras, index=0)
+st.markdown("## 📍 Ubicación del estudiante dentro del análisis general")
 
-d_carrera = df[df[columna_carrera] == carrera_sel].copy()
-if d_carrera.empty:
-    st.warning("No hay estudiantes para esta carrera.")
-    st.stop()
+with etapa(registro, "5) ubicación", 1):
+    categoria_larga = cat_map_largo.get(al['Semáforo Vocacional'], al['Semáforo Vocacional'])
 
-nombres = sorted(d_carrera[columna_nombre].astype(str).unique())
-est_sel = st.selectbox("Estudiante:", nombres, index=0)
+    n_global_cat = resumen['conteo_global'].get(al['Semáforo Vocacional'], 0)
+    pct_global_cat = (n_global_cat / resumen['n_total'] * 100) if resumen['n_total'] else 0
 
-alumno_mask = (df[columna_carrera] == carrera_sel) & (df[columna_nombre].astype(str) == est_sel)
-alumno = df[alumno_mask].copy()
-if alumno.empty:
-    st.warning("No se encontró el estudiante seleccionado.")
-    st.stop()
+    n_carrera = resumen['n_carrera'].get(carrera_sel, 0)
+    n_carrera_cat = resumen['conteo_carrera'].get(carrera_sel, {}).get(al['Semáforo Vocacional'], 0)
+    pct_carrera_cat = (n_carrera_cat / n_carrera * 100) if n_carrera else 0
 
-al = alumno.iloc[0]
+    destino_compatible = al['Destino_Compatible']
+    if destino_compatible == carrera_sel:
+        texto_transicion = "El perfil del estudiante se mantiene dentro de la carrera elegida."
+    else:
+        texto_transicion = f"El perfil del estudiante presenta mejor ajuste hacia la carrera **{destino_compatible}**."
 
-nivel_alumno = None
-if not df_intensidad.empty and alumno.index[0] in df_intensidad.index:
-    nivel_alumno = df_intensidad.loc[alumno.index[0], 'Nivel_Intensidad']
+    if pd.notna(nivel_alumno):
+        texto_intensidad = descripcion_intensidad.get(nivel_alumno, nivel_alumno)
+    else:
+        texto_intensidad = "No fue posible determinar el nivel de intensidad vocacional para este estudiante."
 
-# ============================================
-# 7) UBICACIÓN DEL ESTUDIANTE DENTRO DEL ANÁLISIS GENERAL
-# ============================================
-st.markdown("## 📍 Ubicación del estudiante dentro del análisis general")
-
-cat_map_largo = {
-    'Verde': 'El perfil coincide con la carrera elegida',
-    'Amarillo': 'El perfil NO va acorde con la carrera elegida',
-    'Rojo': 'No se observa un perfil prioritario',
-    'Sin sugerencia': 'No se observa un perfil prioritario',
-    'Respondió siempre igual': 'Respondió siempre igual'
-}
-
-categoria_larga = cat_map_largo.get(al['Semáforo Vocacional'], al['Semáforo Vocacional'])
-
-conteo_global = df['Semáforo Vocacional'].value_counts()
-n_global_cat = int(conteo_global.get(al['Semáforo Vocacional'], 0))
-pct_global_cat = (n_global_cat / len(df) * 100) if len(df) else 0
-
-conteo_carrera = d_carrera['Semáforo Vocacional'].value_counts()
-n_carrera_cat = int(conteo_carrera.get(al['Semáforo Vocacional'], 0))
-pct_carrera_cat = (n_carrera_cat / len(d_carrera) * 100) if len(d_carrera) else 0
-
-destino_compatible = al['Destino_Compatible']
-if destino_compatible == carrera_sel:
-    texto_transicion = "El perfil del estudiante se mantiene dentro de la carrera elegida."
-else:
-    texto_transicion = f"El perfil del estudiante presenta mejor ajuste hacia la carrera **{destino_compatible}**."
-
-if pd.notna(nivel_alumno):
-    texto_intensidad = descripcion_intensidad.get(nivel_alumno, nivel_alumno)
-else:
-    texto_intensidad = "No fue posible determinar el nivel de intensidad vocacional para este estudiante."
-
-st.markdown(
-    f"""
+    st.markdown(
+        f"""
 - **Distribución general del estudiantado:** el estudiante pertenece a la categoría **{categoria_larga}**, 
 la cual concentra **{n_global_cat} estudiantes ({pct_global_cat:.1f}%)** del total evaluado.
 
@@ -441,119 +443,215 @@ la cual concentra **{n_global_cat} estudiantes ({pct_global_cat:.1f}%)** del tot
 
 - **Transición vocacional compatible por carrera:** {texto_transicion}
 """
-)
+    )
 
 # ============================================
-# 8) CONCLUSIÓN Y RECOMENDACIÓN
+# 6) CONCLUSIÓN Y RECOMENDACIÓN
 # ============================================
 st.markdown("## 📝 Conclusión y recomendación")
 
-texto_conclusion = construir_conclusion_recomendacion(
-    al=al,
-    carrera_sel=carrera_sel,
-    destino_compatible=destino_compatible,
-    nivel_alumno=nivel_alumno
-)
+with etapa(registro, "6) conclusión", 1):
+    texto_conclusion = construir_conclusion_recomendacion(
+        al=al,
+        carrera_sel=carrera_sel,
+        destino_compatible=destino_compatible,
+        nivel_alumno=nivel_alumno
+    )
 
-st.markdown(texto_conclusion)
+    st.markdown(texto_conclusion)
 
 # ============================================
-# 9) PDF
+# 7) PDF
 # ============================================
-def build_pdf_report(
-    estudiante: str,
-    carrera: str,
-    categoria: str,
-    intensidad: str,
-    texto_ubicacion: str,
-    conclusion_txt: str
-) -> bytes:
-    buffer = io.BytesIO()
-
-    doc = SimpleDocTemplate(
-        buffer,
-        pagesize=letter,
-        rightMargin=1.8 * cm,
-        leftMargin=1.8 * cm,
-        topMargin=1.6 * cm,
-        bottomMargin=1.6 * cm
+# El PDF se genera sólo al pulsar descargar y se memoiza (LRU acotado, compartido
+# entre sesiones) por versión del análisis + fila del estudiante. Su render ocurre
+# después de la ejecución, así que sólo queda en el log JSON, no en el panel.
+@st.cache_data(show_spinner=False, max_entries=256)
+def pdf_estudiante(version_analisis: str, indice, _campos: dict, _registro=None) -> bytes:
+    with etapa(_registro, "7) PDF · render", 1):
+        from reporte_pdf import build_pdf_report  # ReportLab se carga sólo al descargar
+        return build_pdf_report(**_campos)
+
+with etapa(registro, "7) PDF", 1):
+    texto_ubicacion_pdf = texto_ubicacion_reporte(
+        categoria_larga, n_global_cat, pct_global_cat,
+        carrera_sel, n_carrera_cat, pct_carrera_cat,
+        nivel_alumno, texto_intensidad, destino_compatible
     )
 
-    styles = getSampleStyleSheet()
-    styles.add(ParagraphStyle(
-        name='TitleBlue',
-        parent=styles['Title'],
-        fontName='Helvetica-Bold',
-        fontSize=18,
-        leading=22,
-        textColor=colors.HexColor("#0F766E"),
-        alignment=TA_LEFT,
-        spaceAfter=10
-    ))
-    styles.add(ParagraphStyle(
-        name='HeadingTeal',
-        parent=styles['Heading2'],
-        fontName='Helvetica-Bold',
-        fontSize=12,
-        leading=15,
-        textColor=colors.HexColor("#0F766E"),
-        spaceBefore=8,
-        spaceAfter=6
-    ))
-    styles.add(ParagraphStyle(
-        name='BodySmall',
-        parent=styles['BodyText'],
-        fontName='Helvetica',
-        fontSize=10,
-        leading=14,
-        spaceAfter=6
-    ))
-
-    story = []
-    story.append(Paragraph("Reporte individual CHASIDE", styles['TitleBlue']))
-    story.append(Paragraph(f"<b>Estudiante:</b> {estudiante}", styles['BodySmall']))
-    story.append(Paragraph(f"<b>Carrera:</b> {carrera}", styles['BodySmall']))
-    story.append(Paragraph(f"<b>Perfil identificado:</b> {categoria}", styles['BodySmall']))
-    story.append(Paragraph(f"<b>Intensidad vocacional:</b> {intensidad}", styles['BodySmall']))
-    story.append(Spacer(1, 8))
-
-    story.append(Paragraph("Ubicación dentro del análisis general", styles['HeadingTeal']))
-    for linea in texto_ubicacion.split("\n"):
-        if linea.strip():
-            story.append(Paragraph(linea.strip(), styles['BodySmall']))
-
-    story.append(Paragraph("Conclusión y recomendación", styles['HeadingTeal']))
-    story.append(Paragraph(conclusion_txt, styles['BodySmall']))
-
-    doc.build(story)
-    pdf = buffer.getvalue()
-    buffer.close()
-    return pdf
-
-texto_ubicacion_pdf = (
-    f"Distribución general del estudiantado: el estudiante pertenece a la categoría {categoria_larga}, "
-    f"la cual concentra {n_global_cat} estudiantes ({pct_global_cat:.1f}%) del total evaluado.\n"
-    f"Distribución por carrera y categoría: dentro de {carrera_sel}, el estudiante se ubica en la categoría "
-    f"{categoria_larga}, grupo conformado por {n_carrera_cat} estudiantes ({pct_carrera_cat:.1f}%) de su carrera.\n"
-    f"Intensidad del perfil vocacional por carrera: el estudiante fue clasificado como "
-    f"{nivel_alumno if pd.notna(nivel_alumno) else 'No disponible'}. {texto_intensidad}\n"
-    f"Transición vocacional compatible por carrera: "
-    f"{'El perfil del estudiante se mantiene dentro de la carrera elegida.' if destino_compatible == carrera_sel else f'El perfil del estudiante presenta mejor ajuste hacia {destino_compatible}.'}"
-)
+    campos_pdf = dict(
+        estudiante=est_sel,
+        carrera=carrera_sel,
+        categoria=categoria_larga,
+        intensidad=nivel_alumno if pd.notna(nivel_alumno) else "No disponible",
+        texto_ubicacion=texto_ubicacion_pdf,
+        conclusion_txt=texto_conclusion
+    )
 
-pdf_bytes = build_pdf_report(
-    estudiante=est_sel,
-    carrera=carrera_sel,
-    categoria=categoria_larga,
-    intensidad=nivel_alumno if pd.notna(nivel_alumno) else "No disponible",
-    texto_ubicacion=texto_ubicacion_pdf,
-    conclusion_txt=texto_conclusion
-)
+    st.download_button(
+        label="⬇️ Descargar perfil identificado en PDF",
+        data=functools.partial(pdf_estudiante, version_analisis, indice_alumno, campos_pdf, sin_panel(registro)),
+        file_name=nombre_archivo_pdf(est_sel),
+        mime="application/pdf",
+        use_container_width=True
+    )
 
-st.download_button(
-    label="⬇️ Descargar perfil identificado en PDF",
-    data=pdf_bytes,
-    file_name=f"perfil_CHASIDE_{est_sel.replace(' ', '_')}.pdf",
-    mime="application/pdf",
-    use_container_width=True
-)
+with st.expander("📦 Exportación masiva de reportes PDF"):
+    alcance = st.radio(
+        "Reportes a generar:",
+        [f"Carrera seleccionada ({carrera_sel})", "Toda la cohorte"],
+        horizontal=True
+    )
+    procesos = st.number_input(
+        "Procesos en paralelo:", min_value=1, max_value=os.cpu_count() or 1, value=os.cpu_count() or 1
+    )
+    if st.button("Generar ZIP de reportes"):
+        carrera_lote = None if alcance == "Toda la cohorte" else carrera_sel
+        total = int(
+            df[columna_carrera].notna().sum() if carrera_lote is None
+            else (df[columna_carrera] == carrera_lote).sum()
+        )
+        barra = st.progress(0.0, text="Generando reportes…")
+
+        def al_progresar(hechos, segundos):
+            barra.progress(
+                min(hechos / total, 1.0) if total else 1.0,
+                text=f"{hechos}/{total} reportes · {hechos / segundos if segundos else 0:.1f} reportes/s"
+            )
+
+        from reporte_pdf import generar_zip_reportes
+
+        with tempfile.NamedTemporaryFile(suffix=".zip") as tmp:
+            with etapa(registro, "7) PDF · ZIP", total):
+                generar_zip_reportes(
+                    tareas_reportes(df, carrera_lote, cubo),
+                    tmp,
+                    procesos=int(procesos),
+                    al_progresar=al_progresar
+                )
+            tmp.seek(0)
+            st.download_button(
+                label="⬇️ Descargar ZIP de reportes",
+                data=tmp.read(),
+                file_name=f"reportes_CHASIDE_{(carrera_lote or 'cohorte').replace(' ', '_')}.zip",
+                mime="application/zip",
+                use_container_width=True
+            )
+
+# ============================================
+# 8) CONCLUSIONES DE TODA LA COHORTE
+# ============================================
+# Se arma al pulsar descargar a partir del análisis en caché (sin volver a procesar)
+# y se memoiza por versión del análisis y formato.
+@st.cache_data(show_spinner=False, max_entries=4)
+def archivo_conclusiones(version_analisis: str, formato: str, _df, _registro=None) -> bytes:
+    with etapa(_registro, "8) conclusiones · exportación", len(_df)):
+        return archivo_tabla(tabla_conclusiones(_df), formato)
+
+with st.expander("📄 Conclusiones de toda la cohorte (CSV / Excel)"):
+    st.caption(
+        "Una fila por estudiante con su semáforo, nivel de intensidad, destino compatible "
+        "y la conclusión y recomendación."
+    )
+    if len(df) <= FILAS_MAX_EXCEL:
+        formatos = ["CSV", "Excel"]
+    else:
+        formatos = ["CSV"]
+        st.caption(
+            f"Excel admite hasta {FILAS_MAX_EXCEL:,} filas por hoja; con {len(df):,} "
+            "estudiantes la tabla se descarga en CSV."
+        )
+    formato_conclusiones = st.radio("Formato:", formatos, horizontal=True)
+    extension = "csv" if formato_conclusiones == "CSV" else "xlsx"
+    st.download_button(
+        label="⬇️ Descargar conclusiones de la cohorte",
+        data=functools.partial(
+            archivo_conclusiones, version_analisis, extension, df, sin_panel(registro)
+        ),
+        file_name=f"conclusiones_CHASIDE.{extension}",
+        mime=(
+            "text/csv" if extension == "csv"
+            else "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+        ),
+        use_container_width=True
+    )
+
+# ============================================
+# 9) ANÁLISIS DE SENSIBILIDAD (PESOS Y PERFILES)
+# ============================================
+# Todas las configuraciones se evalúan juntas sobre el análisis en caché; el
+# resultado se comparte por versión del análisis y configuración pedida.
+@st.cache_resource(show_spinner="Evaluando configuraciones…", max_entries=4)
+def sensibilidad(version_analisis: str, pesos: tuple, texto_perfiles: str, _df: pd.DataFrame) -> dict:
+    return evaluar_sensibilidad(_df, list(pesos), interpretar_perfiles(texto_perfiles))
+
+with st.expander("🧪 Análisis de sensibilidad (pesos y perfiles de carrera)"):
+    st.caption(
+        "Compara la clasificación vigente con otras ponderaciones intereses/aptitudes y, "
+        "opcionalmente, con otros perfiles de carrera, sin volver a procesar la hoja."
+    )
+    texto_pesos = st.text_input("Pares de pesos intereses/aptitudes:", "0.7/0.3, 0.6/0.4, 0.5/0.5")
+    texto_perfiles = st.text_area(
+        'Conjuntos de perfiles alternativos (JSON opcional, p. ej. {"Propuesta": {"Arquitectura": ["A", "I"]}}); '
+        "cada conjunto redefine sólo las carreras que menciona:",
+        ""
+    )
+    if st.button("Evaluar configuraciones"):
+        st.session_state['sensibilidad'] = (texto_pesos, texto_perfiles)
+
+    if 'sensibilidad' in st.session_state:
+        pesos_pedidos, perfiles_pedidos = st.session_state['sensibilidad']
+        try:
+            with etapa(registro, "9) sensibilidad", len(df)):
+                resultado = sensibilidad(
+                    version_analisis, tuple(interpretar_pesos(pesos_pedidos)), perfiles_pedidos, df
+                )
+        except ValueError as e:
+            st.error(f"❌ {e}")
+        else:
+            st.markdown("**Resumen por configuración** (la primera es la vigente)")
+            st.dataframe(resultado['resumen'], hide_index=True, use_container_width=True)
+
+            etiquetas = [c['Configuración'] for c in resultado['configuraciones']]
+            if len(etiquetas) > 1:
+                etiqueta_sel = st.selectbox("Movimientos respecto a la vigente:", etiquetas[1:])
+                k = etiquetas.index(etiqueta_sel)
+                st.markdown("**Semáforo vocacional** (vigente en filas)")
+                st.dataframe(transiciones_sensibilidad(resultado, k, 'semaforo'), use_container_width=True)
+                st.markdown("**Nivel de intensidad** (vigente en filas)")
+                st.dataframe(transiciones_sensibilidad(resultado, k, 'nivel'), use_container_width=True)
+
+# ============================================
+# 10) ESTUDIANTES CON RESPUESTAS SIMILARES
+# ============================================
+# El índice empaquetado (16 bytes por estudiante) se arma una vez por versión del
+# análisis; cada consulta es un XOR + popcount sobre toda la cohorte o la carrera.
+@st.cache_resource(show_spinner=False, max_entries=8)
+def indice_similitud(version_analisis: str, _df: pd.DataFrame, _respuestas, n_items: int) -> dict:
+    return construir_indice_similitud(_df, _respuestas, n_items)
+
+with st.expander(f"👥 Estudiantes con respuestas más parecidas a {est_sel}"):
+    st.caption(
+        "Compañeros cuyas 98 respuestas difieren en menos ítems de las del estudiante, "
+        "con su carrera, semáforo y destino compatible."
+    )
+    columna_k, columna_alcance = st.columns(2)
+    k_similares = columna_k.slider("Número de estudiantes:", min_value=5, max_value=50, value=10)
+    alcance_similares = columna_alcance.radio(
+        "Buscar en:", [f"Su carrera ({carrera_sel})", "Toda la cohorte"], horizontal=True
+    )
+    with etapa(registro, "10) similares") as medicion:
+        indice_sim = indice_similitud(version_analisis, df, estado['respuestas'], len(estado['columnas'][5:103]))
+        posiciones_sim, distancias_sim = estudiantes_similares(
+            indice_sim, posicion_alumno, k_similares,
+            carrera=None if alcance_similares == "Toda la cohorte" else carrera_sel
+        )
+        medicion['filas'] = len(df)
+    if len(posiciones_sim):
+        st.dataframe(
+            tabla_similares(df, posiciones_sim, distancias_sim, indice_sim['n_items']),
+            hide_index=True,
+            use_container_width=True
+        )
+    else:
+        st.caption("No hay otros estudiantes con quienes comparar.")
@@ -0,0 +1,81 @@
+# ============================================
+# CHASIDE · PERFILADO POR ETAPAS (OPCIONAL)
+# Tiempo de pared, filas procesadas y delta de memoria por etapa, con una
+# línea JSON por etapa en el logger "chaside.perfilado". Desactivado
+# (registro None) cada etapa cuesta sólo la entrada al contexto.
+# ============================================
+
+import os
+import sys
+import json
+import time
+import logging
+import contextlib
+
+log_perfilado = logging.getLogger("chaside.perfilado")
+
+def configurar_log() -> None:
+    """
+    Destino de las líneas JSON si nadie configuró el logger: el archivo de
+    CHASIDE_PERFILADO_LOG (se agrega al final) o stderr.
+    """
+    if log_perfilado.handlers:
+        return
+    ruta = os.environ.get("CHASIDE_PERFILADO_LOG")
+    handler = logging.FileHandler(ruta, encoding="utf-8") if ruta else logging.StreamHandler(sys.stderr)
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    log_perfilado.addHandler(handler)
+    log_perfilado.setLevel(logging.INFO)
+    log_perfilado.propagate = False
+
+def memoria_residente_mb():
+    """Memoria residente actual del proceso (MB); None si la plataforma no expone /proc."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError, IndexError):
+        return None
+
+def iniciar_registro(activo: bool, al_registrar=None, **contexto):
+    """
+    Registro de una ejecución, o None si el perfilado está desactivado.
+    `contexto` (sesión, ejecución…) se agrega a cada línea JSON y
+    `al_registrar(etapas)` se llama al cerrar cada etapa.
+    """
+    if not activo:
+        return None
+    configurar_log()
+    return {'etapas': [], 'contexto': contexto, 'al_registrar': al_registrar}
+
+def sin_panel(registro):
+    """El mismo registro sin `al_registrar`, para etapas que terminan fuera de la ejecución."""
+    return None if registro is None else {**registro, 'al_registrar': None}
+
+@contextlib.contextmanager
+def etapa(registro, nombre: str, filas: int = None):
+    """
+    Mide el bloque como etapa `nombre`. Devuelve un dict donde el bloque puede
+    fijar 'filas' cuando el número sólo se conoce al final.
+    """
+    if registro is None:
+        yield {}
+        return
+    medicion = {'etapa': nombre, 'filas': filas}
+    memoria_inicio = memoria_residente_mb()
+    inicio = time.perf_counter()
+    try:
+        yield medicion
+    finally:
+        memoria_fin = memoria_residente_mb()
+        medicion['segundos'] = round(time.perf_counter() - inicio, 6)
+        medicion['memoria_delta_mb'] = (
+            round(memoria_fin - memoria_inicio, 3)
+            if memoria_inicio is not None and memoria_fin is not None else None
+        )
+        registro['etapas'].append(medicion)
+        log_perfilado.info(json.dumps(
+            {'ts': round(time.time(), 3), **registro['contexto'], **medicion},
+            ensure_ascii=False, default=str
+        ))
+        if registro['al_registrar']:
+            registro['al_registrar'](registro['etapas'])
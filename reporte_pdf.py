@@ -0,0 +1,160 @@
+# ============================================
+# REPORTE PDF INDIVIDUAL CHASIDE
+# Generación individual y masiva (ZIP) con ReportLab
+# ============================================
+
+import io
+import os
+import time
+import zipfile
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib.enums import TA_LEFT
+from reportlab.lib.units import cm
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
+
+# Hoja de estilos por proceso: se construye una vez y se reutiliza en cada reporte
+_estilos = None
+
+def construir_estilos():
+    styles = getSampleStyleSheet()
+    styles.add(ParagraphStyle(
+        name='TitleBlue',
+        parent=styles['Title'],
+        fontName='Helvetica-Bold',
+        fontSize=18,
+        leading=22,
+        textColor=colors.HexColor("#0F766E"),
+        alignment=TA_LEFT,
+        spaceAfter=10
+    ))
+    styles.add(ParagraphStyle(
+        name='HeadingTeal',
+        parent=styles['Heading2'],
+        fontName='Helvetica-Bold',
+        fontSize=12,
+        leading=15,
+        textColor=colors.HexColor("#0F766E"),
+        spaceBefore=8,
+        spaceAfter=6
+    ))
+    styles.add(ParagraphStyle(
+        name='BodySmall',
+        parent=styles['BodyText'],
+        fontName='Helvetica',
+        fontSize=10,
+        leading=14,
+        spaceAfter=6
+    ))
+    return styles
+
+def estilos_proceso():
+    global _estilos
+    if _estilos is None:
+        _estilos = construir_estilos()
+    return _estilos
+
+def build_pdf_report(
+    estudiante: str,
+    carrera: str,
+    categoria: str,
+    intensidad: str,
+    texto_ubicacion: str,
+    conclusion_txt: str
+) -> bytes:
+    buffer = io.BytesIO()
+
+    doc = SimpleDocTemplate(
+        buffer,
+        pagesize=letter,
+        rightMargin=1.8 * cm,
+        leftMargin=1.8 * cm,
+        topMargin=1.6 * cm,
+        bottomMargin=1.6 * cm
+    )
+
+    styles = estilos_proceso()
+
+    story = []
+    story.append(Paragraph("Reporte individual CHASIDE", styles['TitleBlue']))
+    story.append(Paragraph(f"<b>Estudiante:</b> {estudiante}", styles['BodySmall']))
+    story.append(Paragraph(f"<b>Carrera:</b> {carrera}", styles['BodySmall']))
+    story.append(Paragraph(f"<b>Perfil identificado:</b> {categoria}", styles['BodySmall']))
+    story.append(Paragraph(f"<b>Intensidad vocacional:</b> {intensidad}", styles['BodySmall']))
+    story.append(Spacer(1, 8))
+
+    story.append(Paragraph("Ubicación dentro del análisis general", styles['HeadingTeal']))
+    for linea in texto_ubicacion.split("\n"):
+        if linea.strip():
+            story.append(Paragraph(linea.strip(), styles['BodySmall']))
+
+    story.append(Paragraph("Conclusión y recomendación", styles['HeadingTeal']))
+    story.append(Paragraph(conclusion_txt, styles['BodySmall']))
+
+    doc.build(story)
+    pdf = buffer.getvalue()
+    buffer.close()
+    return pdf
+
+# ============================================
+# GENERACIÓN MASIVA
+# ============================================
+def _iniciar_worker():
+    estilos_proceso()
+
+def _render_lote(lote):
+    return [(nombre, build_pdf_report(**campos)) for nombre, campos in lote]
+
+def _lotes(tareas, tamano):
+    lote = []
+    for tarea in tareas:
+        lote.append(tarea)
+        if len(lote) == tamano:
+            yield lote
+            lote = []
+    if lote:
+        yield lote
+
+def generar_zip_reportes(tareas, destino, procesos=None, tamano_lote=16, al_progresar=None) -> int:
+    """
+    Renderiza reportes en paralelo y los escribe en un ZIP a medida que terminan.
+
+    `tareas` es un iterable de (nombre_archivo, campos) donde `campos` son los
+    argumentos de build_pdf_report; `destino` es una ruta o un archivo binario.
+    Sólo hay unos cuantos lotes en vuelo a la vez, así que la memoria no crece
+    con el tamaño de la cohorte. `al_progresar(hechos, segundos)` se llama tras
+    cada lote. Devuelve el número de reportes escritos.
+    """
+    procesos = procesos or os.cpu_count() or 1
+    en_vuelo_max = 2 * procesos
+    hechos = 0
+    inicio = time.perf_counter()
+    # Con "spawn" cada worker volvería a ejecutar el script de Streamlit (registrado
+    # como __main__); "fork" hereda el proceso sin reimportarlo.
+    metodo = "fork" if "fork" in multiprocessing.get_all_start_methods() else "spawn"
+    contexto = multiprocessing.get_context(metodo)
+
+    with zipfile.ZipFile(destino, "w", compression=zipfile.ZIP_DEFLATED) as zf, \
+            ProcessPoolExecutor(procesos, mp_context=contexto, initializer=_iniciar_worker) as pool:
+        pendientes = deque()
+        for lote in _lotes(tareas, tamano_lote):
+            pendientes.append(pool.submit(_render_lote, lote))
+            if len(pendientes) < en_vuelo_max:
+                continue
+            for nombre, pdf in pendientes.popleft().result():
+                zf.writestr(nombre, pdf)
+                hechos += 1
+            if al_progresar:
+                al_progresar(hechos, time.perf_counter() - inicio)
+        while pendientes:
+            for nombre, pdf in pendientes.popleft().result():
+                zf.writestr(nombre, pdf)
+                hechos += 1
+            if al_progresar:
+                al_progresar(hechos, time.perf_counter() - inicio)
+    return hechos
@@ -0,0 +1,142 @@
+# ============================================
+# CHASIDE · PRUEBAS DE CARGA DE FUENTES
+# Lector HTTP contra un servidor local (http.server) con CSV sintéticos:
+# conexiones reutilizadas, 304 con snapshot, 404 y archivos sin la estructura del
+# formulario; e ingesta incremental de un CSV local que crece. Uso:
+#   python -m unittest test_carga        (o: python -m pytest test_carga.py)
+# ============================================
+
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+
+import numpy as np
+import pandas as pd
+
+import chaside
+from benchmark import generar_cohorte
+
+def cubo_ordenado(cubo: pd.DataFrame) -> pd.DataFrame:
+    """El orden de las filas del cubo no importa (actualizar_cubo agrega al final)."""
+    return cubo.sort_values(chaside.columnas_cubo, na_position='first', ignore_index=True)
+
+class ManejadorRegistrado(SimpleHTTPRequestHandler):
+    """Sirve el directorio de prueba con keep-alive y anota (puerto del cliente, código)."""
+    protocol_version = "HTTP/1.1"
+    registro = []
+
+    def send_response(self, code, message=None):
+        self.registro.append((self.client_address[1], self.path, code))
+        super().send_response(code, message)
+
+    def log_message(self, *args):
+        pass
+
+class PruebaCarga(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.datos = tempfile.mkdtemp()
+        generar_cohorte(40, os.path.join(cls.datos, "plantel_a.csv"), semilla=1)
+        generar_cohorte(30, os.path.join(cls.datos, "plantel_b.csv"), semilla=2)
+        with open(os.path.join(cls.datos, "mal_formado.csv"), "w", encoding="utf-8") as f:
+            f.write("a,b\n1,2\n")
+
+        manejador = lambda *a, **k: ManejadorRegistrado(*a, directory=cls.datos, **k)
+        cls.servidor = ThreadingHTTPServer(("127.0.0.1", 0), manejador)
+        cls.base = f"http://127.0.0.1:{cls.servidor.server_address[1]}/"
+        threading.Thread(target=cls.servidor.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.servidor.shutdown()
+        cls.servidor.server_close()
+        shutil.rmtree(cls.datos, ignore_errors=True)
+
+    def setUp(self):
+        # Snapshots y registro de peticiones propios de cada prueba
+        self.snapshots = tempfile.mkdtemp()
+        self.directorio_anterior = chaside.DIRECTORIO_SNAPSHOTS
+        chaside.DIRECTORIO_SNAPSHOTS = self.snapshots
+        ManejadorRegistrado.registro.clear()
+
+    def tearDown(self):
+        chaside.DIRECTORIO_SNAPSHOTS = self.directorio_anterior
+        shutil.rmtree(self.snapshots, ignore_errors=True)
+
+    def test_304_reutiliza_el_snapshot(self):
+        url = self.base + "plantel_a.csv"
+        df, huella = chaside.leer_fuente(url)
+        df_snapshot, huella_snapshot = chaside.leer_fuente(url)
+
+        self.assertEqual([c for _, _, c in ManejadorRegistrado.registro], [200, 304])
+        self.assertEqual(huella, huella_snapshot)
+        pd.testing.assert_frame_equal(df, df_snapshot)
+        self.assertEqual(len(df), 40)
+
+    def test_conexiones_reutilizadas(self):
+        fuentes = [("A", self.base + "plantel_a.csv"), ("B", self.base + "plantel_b.csv")]
+        for _ in range(3):
+            cargadas, errores = chaside.leer_fuentes(fuentes)
+            self.assertEqual(errores, {})
+            self.assertEqual([e for e, _, _ in cargadas], ["A", "B"])
+
+        puertos = {p for p, _, _ in ManejadorRegistrado.registro}
+        self.assertEqual(len(ManejadorRegistrado.registro), 6)
+        # Como mucho una conexión por hilo: las rondas siguientes reutilizan el pool
+        self.assertLessEqual(len(puertos), len(fuentes))
+
+    def test_404_y_archivo_mal_formado_se_omiten(self):
+        fuentes = [
+            ("A", self.base + "plantel_a.csv"),
+            ("No existe", self.base + "no_existe.csv"),
+            ("Mal formado", self.base + "mal_formado.csv"),
+            ("A otra vez", self.base + "plantel_a.csv"),
+        ]
+        cargadas, errores = chaside.leer_fuentes(fuentes)
+
+        self.assertEqual([e for e, _, _ in cargadas], ["A"])
+        self.assertIn("404", errores["No existe"])
+        self.assertIn("faltan columnas requeridas", errores["Mal formado"])
+        self.assertEqual(errores["A otra vez"], "fuente repetida")
+
+    def test_csv_local_que_crece(self):
+        with open(os.path.join(self.datos, "plantel_a.csv"), encoding="utf-8") as f:
+            lineas = f.readlines()
+        ruta = os.path.join(self.snapshots, "creciente.csv")
+
+        def escribir(n_filas):
+            with open(ruta, "w", encoding="utf-8") as f:
+                f.writelines(lineas[:n_filas + 1])
+
+        escribir(25)
+        df_raw, _ = chaside.leer_fuente(ruta)
+        estado = chaside.iniciar_estado(df_raw)
+
+        escribir(40)
+        df_raw, _ = chaside.leer_fuente(ruta)
+        self.assertEqual(len(df_raw), 40)
+        incremental = chaside.actualizar_estado(estado, df_raw)
+        completo = chaside.iniciar_estado(df_raw)
+
+        pd.testing.assert_frame_equal(incremental['df'], completo['df'])
+        pd.testing.assert_frame_equal(cubo_ordenado(incremental['cubo']), cubo_ordenado(completo['cubo']))
+        np.testing.assert_array_equal(incremental['respuestas'], completo['respuestas'])
+        self.assertEqual(incremental['filas_procesadas'], 40)
+
+        # Si cambia la última fila procesada, la hoja no fue sólo de inserción: se analiza completa
+        lineas_editadas = lineas[:41]
+        lineas_editadas[40] = lineas_editadas[40].replace("Sí", "No", 1)
+        self.assertNotEqual(lineas_editadas[40], lineas[40])
+        with open(ruta, "w", encoding="utf-8") as f:
+            f.writelines(lineas_editadas)
+        df_raw, _ = chaside.leer_fuente(ruta)
+        pd.testing.assert_frame_equal(
+            chaside.actualizar_estado(incremental, df_raw)['df'],
+            chaside.iniciar_estado(df_raw)['df']
+        )
+
+if __name__ == "__main__":
+    unittest.main()